@@ -0,0 +1,208 @@
+# src/async_fetch.py
+# asyncio fetch backend: one HTTP/2 client, many requests in flight.
+#
+# fetch_html_cloudscraper ties up a thread per request. Here a single httpx
+# AsyncClient (http2=True) multiplexes the requests to a host over a few
+# connections and a semaphore caps how many are in flight, so thousands of
+# URLs cost tasks, not threads. Per request it does what the cloudscraper path
+# does: page cache + conditional GET, a random UA per attempt, the per-host
+# token bucket / circuit breaker (ratelimit.py) and one root visit for cookies
+# on a 403. The cookie jar comes from session.get_cookie_jar() (the
+# cloudscraper session's if one exists, else a plain CookieJar, so this
+# backend does not need cloudscraper) and is saved by session.save_cookies().
+# The page cache is SQLite + file I/O, so lookups and stores run in worker
+# threads rather than on the event loop.
+#
+# httpx does not solve Cloudflare challenges; pages it can't get fall back to
+# the Selenium pool, as fetch_html does for cloudscraper.
+#
+# Select with FETCH_BACKEND = "http2" in main.py (pip install "httpx[http2]").
+# All requests go through one event loop thread per process; fetch_one() is the
+# blocking entry point (used by fetch_html), fetch_all() the bulk one (batch,
+# pipeline).
+import time
+import random
+import asyncio
+import threading
+from urllib.parse import urlparse
+
+import main
+import metrics
+import session
+import ratelimit
+
+# ---------------- CONFIG ----------------
+CONCURRENCY = 64            # requests in flight, all hosts together
+MAX_CONNECTIONS = 4         # HTTP/2 streams are multiplexed over these
+HTTP2 = True                # False: HTTP/1.1 keep-alive only
+ATTEMPTS = 3
+TIMEOUT = 20
+WARMUP_TIMEOUT = 10
+# ----------------------------------------
+
+class AsyncFetcher:
+    # create inside the event loop that will use it
+    def __init__(self, concurrency=CONCURRENCY, max_connections=MAX_CONNECTIONS, http2=HTTP2,
+                 attempts=ATTEMPTS):
+        try:
+            import httpx
+        except ImportError:
+            raise SystemExit('httpx missing. Install with: pip install "httpx[http2]"')
+        self.attempts = attempts
+        self._sem = asyncio.Semaphore(concurrency)
+        try:
+            self.client = httpx.AsyncClient(
+                http2=http2,
+                limits=httpx.Limits(max_connections=max_connections,
+                                    max_keepalive_connections=max_connections),
+                cookies=session.get_cookie_jar(),
+                follow_redirects=True,
+            )
+        except ImportError:
+            raise SystemExit('h2 missing. Install with: pip install "httpx[http2]"')
+
+    async def _get(self, limiter, target, headers, timeout, stage="fetch_attempt"):
+        with metrics.timer("rate_wait"):
+            while True:
+                wait = limiter.reserve()
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+        generation = limiter.generation
+        try:
+            with metrics.timer(stage):
+                r = await self.client.get(target, headers=headers, timeout=timeout)
+        except Exception:
+            limiter.record(None, generation=generation)
+            metrics.count("http_status", "error")
+            raise
+        limiter.record(r.status_code, r.headers.get("Retry-After"), generation)
+        metrics.count("http_status", str(r.status_code))
+        metrics.count("http_version", r.http_version)
+        return r
+
+    async def fetch(self, url, lookup=None):
+        # page bytes; raises RuntimeError when every attempt failed and
+        # CircuitOpen while the host is paused, like fetch_html_cloudscraper.
+        # lookup: main.cache_lookup(url) if the caller already did it
+        async with self._sem:
+            cached, conditional = lookup or await asyncio.to_thread(main.cache_lookup, url)
+            if cached and cached["fresh"]:
+                return cached["body"]
+            parsed = urlparse(url)
+            host = parsed.netloc
+            root = f"{parsed.scheme}://{host}/"
+            limiter = ratelimit.for_host(host)
+            last_status = None
+            last_body = None
+            for attempt in range(1, self.attempts + 1):
+                headers = main.HEADERS.copy()
+                headers["User-Agent"] = random.choice(main.USER_AGENTS)
+                headers.update(conditional)
+                try:
+                    r = await self._get(limiter, url, headers, TIMEOUT)
+                    last_status, last_body = r.status_code, r.content
+                    html = await asyncio.to_thread(main.accept_response, url, r, cached)
+                    if html is not None:
+                        return html
+                    print(f"[http2] {url}: attempt {attempt} status {last_status}")
+                    if last_status == 403 and session.needs_warmup(host):
+                        try:
+                            print("[http2] 403 -> visiting root to gather cookies...")
+                            await self._get(limiter, root, headers, WARMUP_TIMEOUT, stage="root_warmup")
+                            session.mark_warmed(host)
+                            r2 = await self._get(limiter, url, headers, TIMEOUT)
+                            last_status, last_body = r2.status_code, r2.content
+                            print("[http2] after root visit status:", last_status)
+                            html = await asyncio.to_thread(main.accept_response, url, r2, cached)
+                            if html is not None:
+                                return html
+                        except ratelimit.CircuitOpen:
+                            raise
+                        except Exception as e:
+                            print("[http2] root visit failed:", e)
+                except ratelimit.CircuitOpen:
+                    raise
+                except Exception as e:
+                    print(f"[http2] {url}: attempt {attempt} exception: {e!r}")
+            await asyncio.to_thread(main.save_last_response, last_body)
+            raise RuntimeError(f"http2 fetch failed; last status: {last_status}")
+
+    async def aclose(self):
+        await self.client.aclose()
+
+# ---------- one loop thread per process ----------
+_lock = threading.Lock()
+_loop = None
+_fetcher = None
+
+async def _new_fetcher():
+    return AsyncFetcher()
+
+def _runner():
+    global _loop, _fetcher
+    with _lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="async-fetch", daemon=True).start()
+            try:
+                _fetcher = asyncio.run_coroutine_threadsafe(_new_fetcher(), loop).result()
+            except BaseException:
+                loop.call_soon_threadsafe(loop.stop)
+                raise
+            _loop = loop
+        return _loop, _fetcher
+
+def fetch_one(url, lookup=None):
+    # blocking; safe to call from any number of threads
+    loop, fetcher = _runner()
+    return asyncio.run_coroutine_threadsafe(fetcher.fetch(url, lookup), loop).result()
+
+async def _fetch_all(fetcher, urls, on_page, on_error, headless, stop, concurrency):
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(url):
+        async with gate:
+            if stop is not None and stop.is_set():
+                return False
+            t0 = time.perf_counter()
+            try:
+                try:
+                    html = await fetcher.fetch(url)
+                    backend = "http2"
+                except Exception as e:
+                    print(f"[http2] {url}: {e}; falling back to Selenium")
+                    html = await asyncio.to_thread(main.fetch_html_selenium, url, headless)
+                    backend = "selenium"
+                secs = time.perf_counter() - t0
+                metrics.observe("fetch_page", secs * 1000)
+                metrics.count("fetch_backend", backend)
+                # callbacks run in worker threads: they may parse, or block on
+                # a full queue (which holds this slot: backpressure)
+                await asyncio.to_thread(on_page, url, html, secs)
+                return True
+            except Exception as e:
+                if on_error is not None:
+                    await asyncio.to_thread(on_error, url, e)
+                return False
+
+    return sum(await asyncio.gather(*(one(u) for u in urls)))
+
+def fetch_all(urls, on_page, on_error=None, headless=True, stop=None, concurrency=CONCURRENCY):
+    # fetch every URL concurrently; on_page(url, html, secs) for each page,
+    # on_error(url, exc) for failures (fetch, fallback or on_page itself).
+    # Stops starting new fetches once the threading.Event `stop` is set.
+    # Returns the number of pages handed to on_page.
+    loop, fetcher = _runner()
+    fut = asyncio.run_coroutine_threadsafe(
+        _fetch_all(fetcher, urls, on_page, on_error, headless, stop, concurrency), loop)
+    return fut.result()
+
+def close():
+    global _loop, _fetcher
+    with _lock:
+        if _loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(_fetcher.aclose(), _loop).result()
+        _loop.call_soon_threadsafe(_loop.stop)
+        _loop, _fetcher = None, None
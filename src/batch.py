@@ -0,0 +1,153 @@
+# src/batch.py
+# Scrape many player pages in one process.
+#
+# usage:
+#   python src/batch.py urls.txt
+#   cat urls.txt | python src/batch.py - --workers 8 --per-host 2
+#
+# Requests are paced per host by ratelimit.py; --per-host only caps how many
+# are in flight at once.
+import sys
+import time
+import argparse
+import threading
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import main
+import metrics
+import session
+
+# ---------------- CONFIG ----------------
+DEFAULT_WORKERS = 8
+DEFAULT_PER_HOST = 2        # concurrent requests to the same host
+# ----------------------------------------
+
+def read_urls(path):
+    # one URL per line, blank lines and "#" comments skipped, duplicates dropped
+    f = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        urls = []
+        seen = set()
+        for ln in f:
+            ln = ln.strip()
+            if not ln or ln.startswith("#") or ln in seen:
+                continue
+            seen.add(ln)
+            urls.append(ln)
+        return urls
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+# caps in-flight requests per host; the pacing itself is ratelimit.py's
+class HostLimiter:
+    def __init__(self, per_host=DEFAULT_PER_HOST):
+        self.per_host = per_host
+        self._lock = threading.Lock()
+        self._slots = {}
+
+    def _slot(self, host):
+        with self._lock:
+            if host not in self._slots:
+                self._slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self._slots[host]
+
+    def slot(self, url):
+        # `with limiter.slot(url):` around the network work for url
+        return self._slot(urlparse(url).netloc)
+
+def scrape_one(url, limiter):
+    html = main.fetch_html(url, headless=True, limiter=limiter)
+    return main.parse_page(html, url), main.parse_stats_tables(html)
+
+def run_async(urls, out, table_writer):
+    # FETCH_BACKEND = "http2": one event loop fetches everything (ratelimit.py
+    # paces the hosts, so --workers/--per-host don't apply); pages are
+    # parsed in its callback threads
+    import async_fetch
+    lock = threading.Lock()
+    ok, failed = 0, []
+
+    def on_page(url, html, secs):
+        nonlocal ok
+        info = main.parse_page(html, url)
+        out.write(info)
+        main.save_stats_tables(url, main.parse_stats_tables(html), table_writer)
+        with lock:
+            ok += 1
+            print(f"[batch] {ok + len(failed)}/{len(urls)} {info.get('name')}")
+
+    def on_error(url, e):
+        print("[batch] failed:", url, "-", e)
+        with lock:
+            failed.append(url)
+
+    async_fetch.fetch_all(urls, on_page, on_error, headless=True)
+    return ok, failed
+
+def run_batch(urls, workers=DEFAULT_WORKERS, per_host=DEFAULT_PER_HOST):
+    limiter = HostLimiter(per_host=per_host)
+    # many threads writing the same page.html is pointless
+    main.SAVE_DEBUG_HTML = False
+
+    table_writer = None
+    if main.EXTRACT_STATS_TABLES:
+        import tables
+        table_writer = tables.TableWriter(main.STATS_DIR)
+
+    ok, failed = 0, []
+    t0 = time.monotonic()
+    if main.FETCH_BACKEND == "http2":
+        with main.open_sink() as out:
+            ok, failed = run_async(urls, out, table_writer)
+    else:
+        with main.open_sink() as out, ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(scrape_one, url, limiter): url for url in urls}
+            for fut in as_completed(futures):
+                url = futures[fut]
+                try:
+                    info, stats_tables = fut.result()
+                except Exception as e:
+                    print("[batch] failed:", url, "-", e)
+                    failed.append(url)
+                    continue
+                # rows are written from this thread only
+                out.write(info)
+                main.save_stats_tables(url, stats_tables, table_writer)
+                ok += 1
+                print(f"[batch] {ok + len(failed)}/{len(urls)} {info.get('name')}")
+    session.save_cookies()
+    print(f"[batch] done: {ok} ok, {len(failed)} failed in {time.monotonic() - t0:.1f}s")
+    metrics.summary()
+    return ok, failed
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Scrape a list of FBref player URLs.")
+    ap.add_argument("urls", help="file with one player URL per line, or - for stdin")
+    ap.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    ap.add_argument("--per-host", type=int, default=DEFAULT_PER_HOST,
+                    help="requests in flight per host (ratelimit.py sets the rate)")
+    ap.add_argument("--parsers", type=int, default=0,
+                    help="parse in this many worker processes (see pipeline.py)")
+    return ap.parse_args(argv)
+
+def cli(argv=None):
+    args = parse_args(argv)
+    urls = read_urls(args.urls)
+    if not urls:
+        raise SystemExit("no URLs given")
+    main.ensure_data_dir()
+    if args.parsers > 0:
+        import pipeline
+        _, failed = pipeline.run_pipeline(urls, fetchers=args.workers, parsers=args.parsers,
+                                          per_host=args.per_host)
+    else:
+        _, failed = run_batch(urls, workers=args.workers, per_host=args.per_host)
+    if failed:
+        print("Failed URLs:")
+        for u in failed:
+            print(" ", u)
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,346 @@
+# src/bench.py
+# Offline timing of the parse + extract path on a saved page.
+#
+# usage:
+#   python src/bench.py                     # times src/page.html
+#   python src/bench.py page.html -n 50
+#   python src/bench.py --against /tmp/old_main.py   # compare with another main.py
+#   python src/bench.py --dates [--against ...]       # date parser corpus + timing
+#   python src/bench.py --corpus pages/ --replicate 5000   # throughput over a corpus
+#   python src/bench.py --corpus pages/ --write-golden     # record golden rows first
+#   python src/bench.py --imports                          # import-time budget
+#   python src/bench.py --corpus pages/ --extractor lxml   # XPath backend vs golden
+#
+# A corpus is a directory of saved player pages (*.html). golden.json in the
+# same directory maps file name -> expected row; --corpus checks every parsed
+# page against it (not source_url, nor age, which moves with the calendar).
+# --replicate cycles the pages until that many have been parsed, each copy
+# made unique so nothing can be served from a per-document cache.
+#
+# (get an old version with e.g. `git show HEAD~1:src/main.py > /tmp/old_main.py`)
+import os
+import sys
+import json
+import time
+import glob
+import argparse
+import subprocess
+import contextlib
+import importlib.util
+
+import main
+import dates
+import tables
+import metrics
+import fragments
+
+GOLDEN_NAME = "golden.json"
+# `import main` in a fresh interpreter (python -X importtime, best of N runs).
+# bs4 + lxml are most of it; cloudscraper alone used to add ~120 ms.
+IMPORT_BUDGET_MS = 150
+# must not be imported by `import main` + parse_page (parse-only / offline jobs)
+NETWORK_MODULES = ("cloudscraper", "requests", "urllib3", "httpx", "h2", "selenium",
+                   "webdriver_manager", "ssl")
+
+# raw strings seen on the pages behind data/output.csv, plus the non-dates
+# the extractors pass in; value is the expected ISO date (None = no date)
+DATE_CORPUS = [
+    ("1994-12-08", "1994-12-08"),               # JSON-LD birthDate
+    ("1993-07-28", "1993-07-28"),
+    ("1997/04/03", "1997-04-03"),
+    ("April 3, 1997", "1997-04-03"),            # <span data-birth> text
+    ("December 8, 1994", "1994-12-08"),
+    ("Nov 15, 1992", "1992-11-15"),
+    ("5 February 1985", "1985-02-05"),
+    ("28 Jul 1993", "1993-07-28"),
+    ("June 2027", "2027-06-01"),                # "Expires June 2027"
+    ("Jun 2027", "2027-06-01"),
+    ("June\xa02027", "2027-06-01"),
+    ("Expires June 2027. Via Capology", "2027-06-01"),
+    ("Debut: 12 August 2017 vs Brighton", "2017-08-01"),   # month-year rule runs first
+    ("born 1997-04-03 in São Paulo", "1997-04-03"),
+    ("2020-02-30", None),
+    ("Not Found", None),
+    (":", None),
+    ("", None),
+]
+
+def load_module(path, name="other_main"):
+    # the other file still imports its siblings (cache, session, ...) from src/
+    spec = importlib.util.spec_from_file_location(name, path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+def timed(fn, n):
+    # returns (ms per call, last result)
+    out = None
+    t0 = time.perf_counter()
+    for _ in range(n):
+        out = fn()
+    return (time.perf_counter() - t0) * 1000 / n, out
+
+@contextlib.contextmanager
+def quiet():
+    # no prints and no metrics events (they would go to the tracked scraper.log)
+    log_events, metrics.LOG_EVENTS = metrics.LOG_EVENTS, False
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            yield
+    finally:
+        metrics.LOG_EVENTS = log_events
+
+def bench_extract(mod, html, n=20):
+    from bs4 import BeautifulSoup
+    parse_ms, soup = timed(lambda: BeautifulSoup(html, "lxml"), n)
+    meta_ms, (frag, _) = timed(lambda: mod.find_meta_fragment(soup), n)
+    extract_ms, row = timed(lambda: mod.extract_player(soup, frag), n)
+    res = {
+        "parse_ms": parse_ms,
+        "find_meta_ms": meta_ms,
+        "extract_ms": extract_ms,
+        "total_ms": parse_ms + meta_ms + extract_ms,
+        "row": row,
+    }
+    if hasattr(mod, "parse_page"):
+        # end-to-end, including the fast path when the module has one
+        with quiet():
+            res["page_ms"], _ = timed(lambda: mod.parse_page(html, ""), n)
+    return res
+
+def print_result(label, res):
+    print(f"{label:>10}: parse {res['parse_ms']:8.2f} ms | find_meta {res['find_meta_ms']:6.2f} ms"
+          f" | extract {res['extract_ms']:7.2f} ms | total {res['total_ms']:8.2f} ms")
+    if "page_ms" in res:
+        print(f"{'':>10}  parse_page {res['page_ms']:8.2f} ms")
+
+def bench_dates(parse, n=2000):
+    # checks the corpus, then times cold (cache cleared) and warm calls
+    bad = []
+    for raw, want in DATE_CORPUS:
+        got = parse(raw)
+        got = got.isoformat() if got else None
+        if got != want:
+            bad.append((raw, want, got))
+    clear = getattr(parse, "cache_clear", None) or getattr(dates._parse, "cache_clear")
+    strings = [raw for raw, _ in DATE_CORPUS]
+
+    def cold():
+        clear()
+        for raw in strings:
+            parse(raw)
+
+    def warm():
+        for raw in strings:
+            parse(raw)
+
+    cold_ms, _ = timed(cold, n)
+    warm_ms, _ = timed(warm, n)
+    per = 1000 / len(strings)
+    return {"bad": bad, "cold_us": cold_ms * per, "warm_us": warm_ms * per}
+
+def print_dates(label, res):
+    print(f"{label:>10}: {res['cold_us']:6.2f} us/date cold | {res['warm_us']:6.2f} us/date warm"
+          f" | {len(DATE_CORPUS) - len(res['bad'])}/{len(DATE_CORPUS)} corpus ok")
+    for raw, want, got in res["bad"]:
+        print(f"  {raw!r}: expected {want}, got {got}")
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:             # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KiB on Linux, bytes on macOS
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+def load_corpus(path):
+    # [(name, html)] plus the golden rows ({} if there is no golden.json yet)
+    files = sorted(glob.glob(os.path.join(path, "*.html"))) if os.path.isdir(path) else [path]
+    if not files:
+        raise SystemExit(f"no .html pages in {path}")
+    pages = []
+    for fp in files:
+        # bytes, as fetch_html hands them to parse_page
+        with open(fp, "rb") as f:
+            pages.append((os.path.basename(fp), f.read()))
+    golden = {}
+    golden_path = os.path.join(path if os.path.isdir(path) else os.path.dirname(path), GOLDEN_NAME)
+    if os.path.exists(golden_path):
+        with open(golden_path, "r", encoding="utf-8") as f:
+            golden = json.load(f)
+    return pages, golden, golden_path
+
+def replicas(pages, total):
+    # (name, url, html) cycling through the corpus; copies after the first
+    # round get a unique trailing comment
+    for i in range(max(total, len(pages))):
+        name, html = pages[i % len(pages)]
+        if i >= len(pages):
+            html = html + f"\n<!-- replica {i} -->\n".encode()
+        yield name, f"https://fbref.com/en/players/{i:08x}/{os.path.splitext(name)[0]}", html
+
+# not compared against golden.json: source_url depends on the run, age on today
+UNCHECKED_FIELDS = ("source_url", "age")
+
+def diff_row(want, got):
+    return [(k, want.get(k), got.get(k)) for k in want
+            if k not in UNCHECKED_FIELDS and want.get(k) != got.get(k)]
+
+def bench_corpus(pages, golden, total, with_tables=False):
+    lat = []
+    checked, seen, bad = 0, set(), {}
+    metrics.reset()
+    log_events, metrics.LOG_EVENTS = metrics.LOG_EVENTS, False
+    try:
+        with open(os.devnull, "w") as devnull:
+            t_start = time.perf_counter()
+            for name, url, html in replicas(pages, total):
+                # replicas are byte-identical: without this every comment
+                # after the first copy would come from the cross-page cache
+                fragments.shared.clear()
+                t0 = time.perf_counter()
+                with contextlib.redirect_stdout(devnull):
+                    row = main.parse_page(html, url)
+                    if with_tables:
+                        tables.extract_tables(html)
+                lat.append((time.perf_counter() - t0) * 1000)
+                if name in golden:
+                    checked += 1
+                    seen.add(name)
+                    diffs = diff_row(golden[name], row)
+                    if diffs and name not in bad:
+                        bad[name] = diffs
+            wall = time.perf_counter() - t_start
+    finally:
+        metrics.LOG_EVENTS = log_events
+    lat.sort()
+    pct = lambda q: lat[min(len(lat) - 1, int(q * len(lat)))]
+    return {
+        "pages": len(lat),
+        "wall_s": wall,
+        "pages_per_s": len(lat) / wall if wall else 0.0,
+        "p50_ms": pct(0.50),
+        "p99_ms": pct(0.99),
+        "max_ms": lat[-1],
+        "peak_rss_mb": peak_rss_mb(),
+        "checked": checked,
+        "sources": len(seen),
+        "bad": bad,
+    }
+
+def print_corpus(res, golden):
+    rss = f"{res['peak_rss_mb']:.0f} MB" if res["peak_rss_mb"] is not None else "n/a"
+    print(f"{res['pages']} pages in {res['wall_s']:.2f}s: {res['pages_per_s']:.1f} pages/s"
+          f" | p50 {res['p50_ms']:.2f} ms | p99 {res['p99_ms']:.2f} ms | max {res['max_ms']:.2f} ms"
+          f" | peak RSS {rss}")
+    if not golden:
+        print(f"no {GOLDEN_NAME}; rows not checked (use --write-golden)")
+        return
+    print(f"golden: {res['sources'] - len(res['bad'])} source pages ok, {len(res['bad'])} differ"
+          f" ({res['checked']} rows checked)")
+    for name, diffs in res["bad"].items():
+        for k, want, got in diffs:
+            print(f"  {name}: {k}: expected {want!r}, got {got!r}")
+
+def write_golden(pages, path):
+    golden = {}
+    with quiet():
+        for name, html in pages:
+            golden[name] = main.parse_page(html, "")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(golden, f, ensure_ascii=False, indent=1, sort_keys=True)
+    print(f"wrote {len(golden)} golden rows to {path}")
+
+def import_profile(page, runs=5):
+    # (best cumulative ms for `import main`, top-level modules imported by
+    # import + parse_page) from a fresh interpreter per run
+    code = ("import sys, contextlib, io; import main\n"
+            "main.metrics.LOG_EVENTS = False\n"
+            "with contextlib.redirect_stdout(io.StringIO()):\n"
+            f"    main.parse_page(open({page!r}, 'rb').read(), '')\n")
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    best, loaded = None, set()
+    for _ in range(runs):
+        err = subprocess.run([sys.executable, "-X", "importtime", "-c", code], env=env,
+                             capture_output=True, text=True, check=True).stderr
+        for line in err.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, name = line.split("|")
+            name = name.strip()
+            loaded.add(name.split(".")[0])
+            if name == "main":
+                ms = int(cumulative) / 1000
+                best = ms if best is None else min(best, ms)
+    return best, loaded
+
+def check_imports(page, budget=IMPORT_BUDGET_MS):
+    ms, loaded = import_profile(page)
+    network = sorted(m for m in NETWORK_MODULES if m in loaded)
+    print(f"import main: {ms:.1f} ms (budget {budget} ms)")
+    print("network modules after import + parse_page:", ", ".join(network) or "none")
+    return 0 if ms <= budget and not network else 1
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Time parsing and extraction on a saved page.")
+    ap.add_argument("page", nargs="?", default=main.DEBUG_HTML)
+    ap.add_argument("-n", type=int, default=20, help="iterations per stage")
+    ap.add_argument("--against", help="another main.py to compare with")
+    ap.add_argument("--dates", action="store_true", help="benchmark try_parse_date instead")
+    ap.add_argument("--corpus", metavar="DIR", help="parse every saved page in DIR (or one file)")
+    ap.add_argument("--replicate", type=int, default=0, metavar="N",
+                    help="with --corpus: parse N pages, cycling through the corpus")
+    ap.add_argument("--tables", action="store_true", help="with --corpus: also extract stats tables")
+    ap.add_argument("--stages", action="store_true", help="with --corpus: per-stage timing summary")
+    ap.add_argument("--imports", action="store_true",
+                    help="check the import-time budget and that parsing loads no network modules")
+    ap.add_argument("--extractor", choices=("bs4", "lxml"), default=None,
+                    help="main.EXTRACT_BACKEND for parse_page (default: as configured)")
+    ap.add_argument("--write-golden", action="store_true",
+                    help="with --corpus: record the current rows as golden.json")
+    return ap.parse_args(argv)
+
+def cli(argv=None):
+    args = parse_args(argv)
+    if args.extractor:
+        main.EXTRACT_BACKEND = args.extractor
+    if args.dates:
+        if args.against:
+            print_dates("against", bench_dates(load_module(args.against).try_parse_date))
+        res = bench_dates(dates.try_parse_date)
+        print_dates("current", res)
+        return 1 if res["bad"] else 0
+
+    if args.imports:
+        return check_imports(args.page)
+
+    if args.corpus:
+        pages, golden, golden_path = load_corpus(args.corpus)
+        if args.write_golden:
+            write_golden(pages, golden_path)
+            return 0
+        print(f"{args.corpus}: {len(pages)} saved pages, {main.EXTRACT_BACKEND} extractor")
+        res = bench_corpus(pages, golden, args.replicate, with_tables=args.tables)
+        print_corpus(res, golden)
+        if args.stages:
+            metrics.summary(log=False)
+        return 1 if res["bad"] else 0
+
+    with open(args.page, "r", encoding="utf-8") as f:
+        html = f.read()
+    print(f"{os.path.basename(args.page)}: {len(html)} chars, {args.n} iterations")
+
+    res = bench_extract(main, html, args.n)
+    if args.against:
+        other = bench_extract(load_module(args.against), html, args.n)
+        print_result("against", other)
+        if other["row"] != res["row"]:
+            print("WARNING: rows differ")
+            for k in res["row"]:
+                if res["row"].get(k) != other["row"].get(k):
+                    print(f"  {k}: {other['row'].get(k)!r} -> {res['row'].get(k)!r}")
+    print_result("current", res)
+
+if __name__ == "__main__":
+    sys.exit(cli())
@@ -0,0 +1,203 @@
+# src/browser_pool.py
+# A small pool of warm Chrome instances for the Selenium fallback.
+#
+# Starting Chrome (and resolving chromedriver) costs seconds, so drivers are
+# kept around and handed out one page at a time. A driver is quit and
+# replaced after `recycle_after` pages to keep memory in check. Instead of a
+# fixed sleep we wait until the #meta block is in the DOM, or in the page
+# source (inside a comment), or until the page has finished loading without
+# being a challenge page: a 404 or squad page without #meta shouldn't hold a
+# browser for the whole READY_TIMEOUT. While a challenge is showing we keep
+# waiting for it to clear (or for someone to solve it in the window); if it
+# hasn't by then, fetch raises PageNotReady rather than hand back the
+# challenge page.
+#
+# Tests (or offline runs) can swap the pool out with set_browser_pool(), e.g.
+#   set_browser_pool(LocalPagePool({"https://fbref.com/...": html}))
+import os
+import queue
+import atexit
+import threading
+import functools
+
+import metrics
+
+# ---------------- CONFIG ----------------
+POOL_SIZE = 2               # max Chrome instances alive at once
+RECYCLE_AFTER = 50          # pages per driver before it is restarted
+READY_TIMEOUT = 20          # seconds to wait for #meta before taking the page anyway
+CHALLENGE_MARKERS = ("challenge-running", "challenge-form", "cf-challenge", "<title>Just a moment")
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+# ----------------------------------------
+
+@functools.lru_cache(maxsize=1)
+def driver_path():
+    # ChromeDriverManager checks versions / downloads on every install() call
+    from webdriver_manager.chrome import ChromeDriverManager
+    return ChromeDriverManager().install()
+
+def new_driver(headless=True):
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+
+    opts = Options()
+    if headless:
+        opts.add_argument("--headless=new")
+    opts.add_argument("--disable-gpu")
+    opts.add_argument("--no-sandbox")
+    opts.add_argument("--disable-dev-shm-usage")
+    opts.add_argument("--window-size=1200,900")
+    opts.add_argument("--disable-blink-features=AutomationControlled")
+    opts.add_argument(f"user-agent={USER_AGENT}")
+    print("[selenium] Starting Chrome (real browser). If a CAPTCHA appears, solve it in the browser window.")
+    with metrics.timer("selenium_startup"):
+        return webdriver.Chrome(service=Service(driver_path()), options=opts)
+
+class PageNotReady(RuntimeError):
+    pass
+
+def is_challenge(source):
+    return any(m in source for m in CHALLENGE_MARKERS)
+
+def page_ready(driver):
+    # truthy once the page can be taken: "meta" (live or commented #meta),
+    # "loaded" (complete, no #meta, not a challenge), else False
+    from selenium.webdriver.common.by import By
+    if driver.find_elements(By.ID, "meta"):
+        return "meta"
+    source = driver.page_source
+    if 'id="meta"' in source:
+        # some pages only carry #meta inside a comment; the parser handles that
+        return "meta"
+    if is_challenge(source):
+        return False
+    if driver.execute_script("return document.readyState") == "complete":
+        return "loaded"
+    return False
+
+def wait_for_meta(driver, timeout=READY_TIMEOUT, ready=page_ready):
+    # ready(driver) -> truthy when done; returns its value, or False on timeout
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.common.exceptions import TimeoutException
+    try:
+        return WebDriverWait(driver, timeout).until(ready)
+    except TimeoutException:
+        return False
+
+def _quit(driver):
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+class BrowserPool:
+    def __init__(self, size=POOL_SIZE, recycle_after=RECYCLE_AFTER, headless=True, factory=None):
+        self.size = size
+        self.recycle_after = recycle_after
+        self.headless = headless
+        self.factory = factory or new_driver
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = queue.LifoQueue()
+        self._uses = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _acquire(self):
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            driver = self.factory(self.headless)
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._uses[id(driver)] = 0
+        return driver
+
+    def _release(self, driver, broken=False):
+        with self._lock:
+            uses = self._uses.get(id(driver), 0) + 1
+            self._uses[id(driver)] = uses
+            retire = broken or self._closed or uses >= self.recycle_after
+            if retire:
+                self._uses.pop(id(driver), None)
+        if retire:
+            _quit(driver)
+        else:
+            self._idle.put(driver)
+        self._slots.release()
+
+    def fetch(self, url, timeout=READY_TIMEOUT, ready=page_ready):
+        driver = self._acquire()
+        broken = False
+        try:
+            with metrics.timer("selenium_fetch"):
+                driver.get(url)
+                state = wait_for_meta(driver, timeout, ready) or "timeout"
+                metrics.count("selenium_ready", state)
+                source = driver.page_source
+            if state == "timeout" or is_challenge(source):
+                raise PageNotReady(f"{url}: page not ready after {timeout}s (challenge still showing?)")
+            return source
+        except PageNotReady:
+            raise                   # the driver itself is fine
+        except Exception:
+            broken = True
+            raise
+        finally:
+            self._release(driver, broken)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                _quit(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+# stand-in pool for tests/offline runs: serves pages from a dict or a directory
+# of saved pages named like the last path segment of the URL (+ ".html")
+class LocalPagePool:
+    def __init__(self, pages):
+        self.pages = pages
+        self.requested = []
+
+    def fetch(self, url, timeout=READY_TIMEOUT, ready=None):
+        self.requested.append(url)
+        if isinstance(self.pages, dict):
+            if url not in self.pages:
+                raise RuntimeError(f"no local page for {url}")
+            return self.pages[url]
+        name = url.rstrip("/").rsplit("/", 1)[-1] + ".html"
+        path = os.path.join(self.pages, name)
+        if not os.path.exists(path):
+            raise RuntimeError(f"no local page for {url}")
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def close(self):
+        pass
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_browser_pool(headless=True):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool(headless=headless)
+            atexit.register(_pool.close)
+        return _pool
+
+def set_browser_pool(pool):
+    # returns the previous pool so callers can restore it
+    global _pool
+    with _pool_lock:
+        prev, _pool = _pool, pool
+    return prev
@@ -0,0 +1,189 @@
+# src/cache.py
+# On-disk page cache keyed by URL.
+#
+# Bodies are stored as raw UTF-8 under data/cache/<aa>/<sha256(url)>.html
+# (or gzip-compressed as .html.gz with COMPRESS on), with a small SQLite index
+# holding fetch time, ETag / Last-Modified and last access time. Entries
+# younger than the TTL are served without touching the network; older ones
+# are revalidated with a conditional GET. When the cache grows past max_bytes
+# the least recently used pages are dropped.
+#
+# Fresh raw bodies are handed out as a read-only mmap rather than read into a
+# str: the fast parse path only touches the head of the page, so most of a
+# cached page never has to be copied into the process at all. Stale ones are
+# read as bytes, since they are about to be revalidated and maybe replaced,
+# and Windows refuses to replace or delete a file while it is mapped.
+import os
+import gzip
+import mmap
+import time
+import sqlite3
+import hashlib
+import threading
+
+# ---------------- CONFIG ----------------
+THIS_DIR = os.path.dirname(__file__)
+CACHE_DIR = os.path.join(THIS_DIR, "..", "data", "cache")
+CACHE_TTL = 12 * 3600               # seconds a page is served without revalidation
+# size on disk: ~5,000 raw player pages (~740 KB each), enough that a nightly
+# re-scrape of a few thousand players still finds them (500 MB with COMPRESS)
+CACHE_MAX_BYTES = 4 * 1024 * 1024 * 1024
+COMPRESS = False                    # gzip bodies: ~7x less disk, but no mmap
+# ----------------------------------------
+
+def url_key(url):
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+def map_file(path):
+    # read-only mmap of a whole file (bytes-like: slicing, find, re all work)
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+class PageCache:
+    def __init__(self, root=CACHE_DIR, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES):
+        self.root = root
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(root, "index.db"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " key TEXT PRIMARY KEY, url TEXT, fetched_at REAL, accessed_at REAL,"
+            " etag TEXT, last_modified TEXT, size INTEGER)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS pages_accessed ON pages(accessed_at)")
+        self._db.commit()
+
+    def _path(self, key, compressed=False):
+        return os.path.join(self.root, key[:2], key + (".html.gz" if compressed else ".html"))
+
+    def _read(self, key, mapped=True):
+        path = self._path(key)
+        if os.path.exists(path):
+            if mapped:
+                return map_file(path)
+            with open(path, "rb") as f:
+                return f.read()
+        # written with COMPRESS on (or before raw bodies existed)
+        with gzip.open(self._path(key, compressed=True), "rb") as f:
+            return f.read()
+
+    def _remove(self, key):
+        # False if a file could not be deleted (on Windows: still mapped)
+        removed = True
+        for compressed in (False, True):
+            try:
+                os.remove(self._path(key, compressed))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"[cache] could not remove {key}: {e}")
+                removed = False
+        return removed
+
+    def get(self, url):
+        # returns a dict with body (UTF-8 bytes, or an mmap of them when
+        # fresh), etag, last_modified, fetched_at and fresh, or None
+        key = url_key(url)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT fetched_at, etag, last_modified FROM pages WHERE key = ?", (key,)
+            ).fetchone()
+            if not row:
+                return None
+            fetched_at, etag, last_modified = row
+            fresh = time.time() - fetched_at < self.ttl
+            try:
+                body = self._read(key, mapped=fresh)
+            except (OSError, ValueError):
+                # ValueError: mmap of an empty file
+                # index points at a missing/corrupt file
+                self._db.execute("DELETE FROM pages WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE pages SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+        return {
+            "body": body,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": fetched_at,
+            "fresh": fresh,
+        }
+
+    def put(self, url, body, etag=None, last_modified=None):
+        key = url_key(url)
+        path = self._path(key, COMPRESS)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = body.encode("utf-8") if isinstance(body, str) else body
+        if COMPRESS:
+            data = gzip.compress(data)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        try:
+            os.replace(tmp, path)
+        except PermissionError as e:
+            # Windows: someone still has the old body mapped; keep it
+            print(f"[cache] could not store {url}: {e}")
+            os.remove(tmp)
+            return
+        # drop the copy in the other format so _read can't pick up a stale one
+        try:
+            os.remove(self._path(key, not COMPRESS))
+        except OSError:
+            pass
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, url, now, now, etag, last_modified, len(data)),
+            )
+            self._db.commit()
+        self.evict()
+
+    def mark_revalidated(self, url):
+        # a 304 came back: the stored body is good for another TTL
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE pages SET fetched_at = ?, accessed_at = ? WHERE key = ?",
+                (now, now, url_key(url)),
+            )
+            self._db.commit()
+
+    def evict(self):
+        with self._lock:
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+            if total <= self.max_bytes:
+                return 0
+            dropped = 0
+            for key, size in self._db.execute(
+                "SELECT key, size FROM pages ORDER BY accessed_at"
+            ).fetchall():
+                if total <= self.max_bytes:
+                    break
+                if not self._remove(key):
+                    continue        # keep the row so a later evict() retries it
+                self._db.execute("DELETE FROM pages WHERE key = ?", (key,))
+                total -= size
+                dropped += 1
+            self._db.commit()
+        if dropped:
+            print(f"[cache] evicted {dropped} pages")
+        return dropped
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_page_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PageCache()
+        return _cache
@@ -0,0 +1,313 @@
+# src/crawl.py
+# Discover player pages from the ones already fetched and scrape them.
+#
+# Every player page links the player's club and national team from #meta and
+# has a "Similar Players" table (div_similar_*). Starting from a few seed
+# URLs the crawler follows both: similar players directly, squads through
+# their roster table (stats_standard_*). Links are pulled out of the raw
+# bytes with regexes, no soup. What to fetch next comes from a priority
+# frontier (shallowest first; at equal depth similar players, then squads,
+# then roster players), bounded by --max-depth, --max-pages and
+# --max-squads. Players and squads are deduplicated by FBref id in a Bloom
+# filter as they are queued. The filter and whatever is still queued (plus
+# failures and URLs held back by the limits) are saved to data/ when the run
+# ends, so the next crawl resumes from there instead of rediscovering the
+# same players (--fresh starts over).
+#
+# Fetching goes through batch.HostLimiter and main.fetch_html (cache,
+# rate limits, browser fallback) and rows through the usual sink.
+#
+# usage:
+#   python src/crawl.py https://fbref.com/en/players/b66315ae/Gabriel-Jesus --max-pages 500
+#   python src/crawl.py seeds.txt --max-depth 2 --no-squads
+import os
+import re
+import json
+import math
+import heapq
+import struct
+import hashlib
+import argparse
+import itertools
+from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import main
+import batch
+import metrics
+import session
+
+# ---------------- CONFIG ----------------
+SEEN_PATH = os.path.join(main.DATA_DIR, "crawl_seen.bloom")
+FRONTIER_PATH = os.path.join(main.DATA_DIR, "crawl_frontier.jsonl")
+MAX_PAGES = 200             # player pages scraped per run
+MAX_DEPTH = 3               # link hops from a seed
+MAX_SQUADS = 50             # squad pages fetched per run
+BLOOM_CAPACITY = 1_000_000
+BLOOM_ERROR = 1e-4          # chance a new player is taken for a seen one
+# ----------------------------------------
+
+PLAYER_HREF_RE = re.compile(rb'href="(/en/players/([0-9a-f]{8})/[^"/?#]+)"')
+SQUAD_HREF_RE = re.compile(rb'href="(/en/squads/([0-9a-f]{8})/[^"/?#]+)"')
+SIMILAR_RE = re.compile(rb'id="div_similar_')
+ROSTER_RE = re.compile(rb'<table[^>]*\bid="stats_standard_')
+KIND_PLAYER = re.compile(r'/en/players/([0-9a-f]{8})(?:/|$)')
+KIND_SQUAD = re.compile(r'/en/squads/([0-9a-f]{8})(?:/|$)')
+
+# frontier order at equal depth
+RANK = {"similar": 0, "seed": 0, "squad": 1, "roster": 2}
+
+class BloomFilter:
+    def __init__(self, capacity=BLOOM_CAPACITY, error_rate=BLOOM_ERROR):
+        self.m = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.k = max(1, round(self.m / capacity * math.log(2)))
+        self.bits = bytearray((self.m + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        d = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = struct.unpack("<QQ", d)
+        return [(h1 + i * h2) % self.m for i in range(self.k)]
+
+    def __contains__(self, key):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    def add(self, key):
+        # True if key was new
+        new = False
+        for p in self._positions(key):
+            if not self.bits[p >> 3] & (1 << (p & 7)):
+                self.bits[p >> 3] |= 1 << (p & 7)
+                new = True
+        self.count += new
+        return new
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(struct.pack("<QQQ", self.m, self.k, self.count))
+            f.write(self.bits)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        bf = cls.__new__(cls)
+        with open(path, "rb") as f:
+            bf.m, bf.k, bf.count = struct.unpack("<QQQ", f.read(24))
+            bf.bits = bytearray(f.read())
+        if len(bf.bits) != (bf.m + 7) // 8:
+            raise ValueError(f"{path}: truncated Bloom filter")
+        return bf
+
+def seen_key(url):
+    # "player:<id>" / "squad:<id>", so slug and season variants collapse
+    m = KIND_PLAYER.search(url)
+    if m:
+        return "player:" + m.group(1)
+    m = KIND_SQUAD.search(url)
+    return "squad:" + m.group(1) if m else url
+
+def _data(html):
+    return html.encode("utf-8") if isinstance(html, str) else html
+
+def _links(data, start, end, href_re):
+    out = []
+    for m in href_re.finditer(data, start, end):
+        out.append(m.group(1).decode("ascii", "replace"))
+    return out
+
+def _table_regions(data, open_re):
+    # (start, end) of every table opened at an open_re match, live or commented
+    regions = []
+    for m in open_re.finditer(data):
+        end = data.find(b"</table>", m.end())
+        regions.append((m.start(), len(data) if end < 0 else end))
+    return regions
+
+def player_links(html):
+    # (similar player URLs, squad URLs) from a player page
+    data = _data(html)
+    similar = []
+    for start, end in _table_regions(data, SIMILAR_RE):
+        similar += _links(data, start, end, PLAYER_HREF_RE)
+    bounds = main.meta_bounds(data)
+    squads = _links(data, bounds[0], bounds[1], SQUAD_HREF_RE) if bounds else []
+    return similar, squads
+
+def roster_links(html):
+    # player URLs from a squad page's standard stats table(s)
+    data = _data(html)
+    players = []
+    for start, end in _table_regions(data, ROSTER_RE):
+        players += _links(data, start, end, PLAYER_HREF_RE)
+    return players
+
+class Frontier:
+    def __init__(self):
+        self._heap = []
+        self._seq = itertools.count()
+
+    def push(self, url, depth, via):
+        heapq.heappush(self._heap, (depth, RANK[via], next(self._seq), url, via))
+
+    def pop(self):
+        depth, _, _, url, via = heapq.heappop(self._heap)
+        return url, depth, via
+
+    def __len__(self):
+        return len(self._heap)
+
+    def drain(self):
+        while self._heap:
+            yield self.pop()
+
+    def save(self, path, extra=()):
+        # extra: more (url, depth, via) to keep for the next run
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for url, depth, via in itertools.chain(self.drain(), extra):
+                f.write(json.dumps({"url": url, "depth": depth, "via": via}) + "\n")
+        os.replace(tmp, path)
+
+    def load(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    item = json.loads(line)
+                    self.push(item["url"], item["depth"], item["via"])
+
+def visit(url, via, limiter):
+    # (row or None, stats tables, [(url, via)] found on the page)
+    html = main.fetch_html(url, headless=True, limiter=limiter)
+    if via == "squad":
+        return None, None, [(u, "roster") for u in roster_links(html)]
+    similar, squads = player_links(html)
+    found = [(u, "similar") for u in similar] + [(u, "squad") for u in squads]
+    return main.parse_page(html, url), main.parse_stats_tables(html), found
+
+def crawl(seeds, max_pages=MAX_PAGES, max_depth=MAX_DEPTH, max_squads=MAX_SQUADS,
+          follow_squads=True, seen=None, frontier=None, workers=batch.DEFAULT_WORKERS,
+          per_host=batch.DEFAULT_PER_HOST):
+    # returns (players scraped, failed URLs, [(url, depth, via)] not visited
+    # because of the limits or a failure); frontier keeps what was never popped,
+    # and on an interrupt everything not visited
+    main.SAVE_DEBUG_HTML = False
+    limiter = batch.HostLimiter(per_host=per_host)
+    seen = BloomFilter() if seen is None else seen
+    frontier = Frontier() if frontier is None else frontier
+    for url in seeds:
+        # seeds are always visited, even if an earlier crawl saw them
+        seen.add(seen_key(url))
+        frontier.push(url, 0, "squad" if KIND_SQUAD.search(url) else "seed")
+
+    table_writer = None
+    if main.EXTRACT_STATS_TABLES:
+        import tables
+        table_writer = tables.TableWriter(main.STATS_DIR)
+
+    scraped, squads, failed, held = 0, 0, [], []
+    running = {}
+    with main.open_sink() as out, ThreadPoolExecutor(max_workers=workers) as pool:
+        try:
+            while frontier or running:
+                # keep the pool busy without overshooting the limits
+                while frontier and len(running) < workers * 2:
+                    players_running = sum(1 for _, via, _ in running.values() if via != "squad")
+                    url, depth, via = frontier.pop()
+                    if via == "squad":
+                        if squads >= max_squads:
+                            held.append((url, depth, via))
+                            continue
+                        squads += 1
+                    elif scraped + players_running >= max_pages:
+                        held.append((url, depth, via))
+                        continue
+                    running[pool.submit(visit, url, via, limiter)] = (url, via, depth)
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    url, via, depth = running.pop(fut)
+                    try:
+                        info, stats_tables, found = fut.result()
+                    except Exception as e:
+                        print("[crawl] failed:", url, "-", e)
+                        failed.append(url)
+                        held.append((url, depth, via))
+                        continue
+                    if info is not None:
+                        out.write(info)
+                        main.save_stats_tables(url, stats_tables, table_writer)
+                        scraped += 1
+                        print(f"[crawl] {scraped}/{max_pages} depth {depth} ({via}) {info.get('name')}")
+                    new = 0
+                    if depth < max_depth:
+                        for link, link_via in found:
+                            if link_via == "squad" and not follow_squads:
+                                continue
+                            if seen.add(seen_key(link)):
+                                frontier.push(urljoin(url, link), depth + 1, link_via)
+                                new += 1
+                    metrics.count("crawl_links", via, new)
+        except BaseException:
+            # interrupted: hand what was held back or still in flight to the
+            # frontier, so the caller's frontier.save() keeps it (their ids
+            # are already in `seen`, nothing would find them again)
+            pool.shutdown(wait=False, cancel_futures=True)
+            for url, via, depth in running.values():
+                frontier.push(url, depth, via)
+            for url, depth, via in held:
+                frontier.push(url, depth, via)
+            raise
+    session.save_cookies()
+    print(f"[crawl] done: {scraped} players, {squads} squads, {len(failed)} failed,"
+          f" {len(frontier) + len(held)} URLs left for the next run, {seen.count} ids seen")
+    metrics.summary()
+    return scraped, failed, held
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Crawl FBref player pages from seed URLs.")
+    ap.add_argument("seeds", nargs="+", help="player/squad URLs, or files of them (- for stdin)")
+    ap.add_argument("--max-pages", type=int, default=MAX_PAGES)
+    ap.add_argument("--max-depth", type=int, default=MAX_DEPTH)
+    ap.add_argument("--max-squads", type=int, default=MAX_SQUADS)
+    ap.add_argument("--no-squads", action="store_true", help="follow similar players only")
+    ap.add_argument("--seen", default=SEEN_PATH, help="Bloom filter of ids already crawled")
+    ap.add_argument("--frontier", default=FRONTIER_PATH, help="URLs queued by earlier runs")
+    ap.add_argument("--fresh", action="store_true", help="ignore the saved seen-set and frontier")
+    ap.add_argument("--workers", type=int, default=batch.DEFAULT_WORKERS)
+    ap.add_argument("--per-host", type=int, default=batch.DEFAULT_PER_HOST)
+    return ap.parse_args(argv)
+
+def cli(argv=None):
+    args = parse_args(argv)
+    seeds = []
+    for s in args.seeds:
+        seeds += [s] if s.startswith(("http://", "https://")) else batch.read_urls(s)
+    if not seeds:
+        raise SystemExit("no seed URLs given")
+    main.ensure_data_dir()
+    seen, frontier = BloomFilter(), Frontier()
+    if not args.fresh and os.path.exists(args.seen):
+        seen = BloomFilter.load(args.seen)
+        print(f"[crawl] {seen.count} ids already seen ({args.seen})")
+    if not args.fresh and os.path.exists(args.frontier):
+        frontier.load(args.frontier)
+        print(f"[crawl] resuming {len(frontier)} queued URLs ({args.frontier})")
+    held = []
+    try:
+        _, failed, held = crawl(seeds, args.max_pages, args.max_depth, args.max_squads,
+                                follow_squads=not args.no_squads, seen=seen, frontier=frontier,
+                                workers=args.workers, per_host=args.per_host)
+    finally:
+        seen.save(args.seen)
+        frontier.save(args.frontier, held)
+    if failed:
+        print("Failed URLs:")
+        for u in failed:
+            print(" ", u)
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,84 @@
+# src/dates.py
+# Date normalisation for the extractors.
+#
+# try_parse_date used to try eight strptime formats by exception and then a
+# few uncompiled re.search calls. Here the common shapes ("1997-04-03",
+# "April 3, 1997", "3 April 1997", "June 2027") are recognised by one
+# precompiled pattern each and turned into a date directly; anything else
+# goes through the same search-anywhere rules as before. Results are
+# memoised, since the same strings ("June 2027") come up again and again.
+import re
+import functools
+from datetime import date
+
+MONTHS = {}
+for _i, _name in enumerate(("january", "february", "march", "april", "may", "june", "july",
+                            "august", "september", "october", "november", "december"), 1):
+    MONTHS[_name] = _i
+    MONTHS[_name[:3]] = _i
+
+# whole-string shapes (what the old strptime formats accepted)
+ISO_RE = re.compile(r'(\d{4})([-/])(\d{1,2})\2(\d{1,2})')       # %Y-%m-%d, %Y/%m/%d
+DMY_RE = re.compile(r'(\d{1,2})\s+([A-Za-z]+)\s+(\d{4})')       # %d %B %Y, %d %b %Y
+MDY_RE = re.compile(r'([A-Za-z]+)\s+(\d{1,2}),\s+(\d{4})')      # %B %d, %Y, %b %d, %Y
+MY_RE = re.compile(r'([A-Za-z]+)\s+(\d{4})')                    # %B %Y, %b %Y
+
+# search-anywhere fallbacks, tried in this order
+MY_ANY_RE = re.compile(r'([A-Za-z]+)\s+(\d{4})')
+ISO_ANY_RE = re.compile(r'(\d{4})-(\d{2})-(\d{2})')
+DMY_ANY_RE = re.compile(r'(\d{1,2})\s+([A-Za-z]{3,9})\s+(\d{4})')
+
+def _make(y, m, d):
+    if m is None:
+        return None
+    try:
+        return date(int(y), int(m), int(d))
+    except ValueError:
+        return None
+
+def _month(name):
+    return MONTHS.get(name.lower())
+
+def _whole(s):
+    m = ISO_RE.fullmatch(s)
+    if m:
+        return _make(m.group(1), m.group(3), m.group(4))
+    m = DMY_RE.fullmatch(s)
+    if m:
+        return _make(m.group(3), _month(m.group(2)), m.group(1))
+    m = MDY_RE.fullmatch(s)
+    if m:
+        return _make(m.group(3), _month(m.group(1)), m.group(2))
+    m = MY_RE.fullmatch(s)
+    if m:
+        return _make(m.group(2), _month(m.group(1)), 1)
+    return None
+
+def _anywhere(s):
+    # month year like "Expires June 2027" (only the first such pair counts)
+    m = MY_ANY_RE.search(s)
+    if m:
+        d = _make(m.group(2), _month(m.group(1)), 1)
+        if d:
+            return d
+    # yyyy-mm-dd anywhere
+    m = ISO_ANY_RE.search(s)
+    if m:
+        d = _make(m.group(1), m.group(2), m.group(3))
+        if d:
+            return d
+    # dd Month yyyy inside text
+    m = DMY_ANY_RE.search(s)
+    if m:
+        return _make(m.group(3), _month(m.group(2)), m.group(1))
+    return None
+
+@functools.lru_cache(maxsize=4096)
+def _parse(s):
+    s = s.strip().replace("\xa0", " ")
+    return _whole(s) or _anywhere(s)
+
+def try_parse_date(s):
+    if not s:
+        return None
+    return _parse(s)
@@ -0,0 +1,148 @@
+# src/fragments.py
+# Index of the HTML comments in a parsed page, and a cache of their parses.
+#
+# FBref ships most of a player page inside <!-- --> comments (stats tables,
+# sometimes #meta itself). Anything that wants one of them used to walk every
+# comment node and parse the matching text again. A FragmentIndex walks the
+# comments of a document once, remembers each one's text and (on first
+# lookup) the element ids it encloses, and parses a fragment only when it is
+# asked for; the parse is kept for the life of the document. Parses are also
+# kept in a small process-wide LRU keyed by a hash of the comment text, so a
+# comment that is byte-identical across pages (boilerplate, or the same page
+# parsed twice: fast path miss, re-scrapes) is parsed once. The LRU is bounded
+# by the total length of the texts it holds, and fragments bigger than
+# MAX_SHARED_FRAGMENT (whole stats tables) are not kept at all: a parse costs
+# several times its text in memory.
+#
+# Parsed fragments are shared, so callers must treat them as read-only (the
+# extractors and tables.py only read).
+#
+#   index = fragments.soup_index(soup)          # BeautifulSoup document
+#   frag = index.parsed(index.with_id("meta")[0])
+#   index = fragments.lxml_index(doc)           # lxml document (tables.py, xpath_extract.py)
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+
+import metrics
+
+# ---------------- CONFIG ----------------
+SHARED_CACHE_SIZE = 128     # parsed fragments kept across documents
+SHARED_CACHE_BYTES = 2_000_000      # ... and the most comment text they may add up to
+MAX_SHARED_FRAGMENT = 64_000        # longer comments are only kept for their own document
+# ----------------------------------------
+
+ID_RE = re.compile(r'\bid="([^"]+)"')
+
+class SharedCache:
+    # LRU of parsed fragments, keyed by (parser kind, digest of the text)
+    def __init__(self, size=SHARED_CACHE_SIZE, max_bytes=SHARED_CACHE_BYTES,
+                 max_item=MAX_SHARED_FRAGMENT):
+        self.size = size
+        self.max_bytes = max_bytes
+        self.max_item = max_item
+        self.nbytes = 0
+        self._items = OrderedDict()     # key -> (fragment, text length)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(kind, text):
+        return kind, hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            self._items.move_to_end(key)
+            return item[0]
+
+    def put(self, key, frag, nbytes):
+        if self.size <= 0 or nbytes > min(self.max_item, self.max_bytes):
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+            self._items[key] = frag, nbytes
+            self.nbytes += nbytes
+            while len(self._items) > self.size or self.nbytes > self.max_bytes:
+                self.nbytes -= self._items.popitem(last=False)[1][1]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.nbytes = 0
+
+shared = SharedCache()
+
+class FragmentIndex:
+    def __init__(self, texts, parse, kind):
+        # texts: comment texts in document order; parse(text) -> fragment
+        self.texts = texts
+        self.kind = kind
+        self._parse = parse
+        self._ids = None
+        self._parsed = {}
+
+    def __len__(self):
+        return len(self.texts)
+
+    @property
+    def ids(self):
+        # per comment, the set of element ids it encloses
+        if self._ids is None:
+            self._ids = [set(ID_RE.findall(t)) if 'id="' in t else set() for t in self.texts]
+        return self._ids
+
+    def with_id(self, element_id):
+        return [i for i, ids in enumerate(self.ids) if element_id in ids]
+
+    def with_id_prefix(self, prefixes):
+        return [i for i, ids in enumerate(self.ids) if any(x.startswith(prefixes) for x in ids)]
+
+    def containing(self, needles):
+        # comments whose text contains any of the needles
+        return [i for i, t in enumerate(self.texts) if any(n in t for n in needles)]
+
+    def parsed(self, i):
+        frag = self._parsed.get(i)
+        if frag is not None:
+            return frag
+        text = self.texts[i]
+        key = SharedCache.key(self.kind, text)
+        frag = shared.get(key)
+        if frag is None:
+            metrics.count("fragment_parse", self.kind)
+            with metrics.timer("fragment_parse." + self.kind):
+                frag = self._parse(text)
+            shared.put(key, frag, len(text))
+        else:
+            metrics.count("fragment_cache_hit", self.kind)
+        self._parsed[i] = frag
+        return frag
+
+def _parse_soup(text):
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(text, "lxml")
+
+def _parse_lxml(text):
+    import lxml.html
+    return lxml.html.fromstring("<div>" + text + "</div>")
+
+def soup_index(soup):
+    # one per BeautifulSoup document, built on first use
+    index = soup.__dict__.get("_fragment_index")     # plain getattr would search the tree
+    if index is None:
+        from bs4 import Comment
+        texts = [c.strip() for c in soup.find_all(string=lambda t: isinstance(t, Comment))]
+        index = soup._fragment_index = FragmentIndex(texts, _parse_soup, "soup")
+    return index
+
+def lxml_index(doc, needles=("<table",)):
+    # for an lxml document; only comments containing one of the needles
+    # are indexed (tables.py wants tables, xpath_extract.py the meta block)
+    from lxml import etree
+    texts = [c.text for c in doc.iter(etree.Comment) if c.text and any(n in c.text for n in needles)]
+    return FragmentIndex(texts, _parse_lxml, "lxml")
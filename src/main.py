@@ -1,24 +1,37 @@
 # src/main.py
 import os
-import csv
 import json
 import re
-from datetime import datetime, date
-
-# optional heavy import is delayed until used
-try:
-    import cloudscraper
-except Exception:
-    raise SystemExit("cloudscraper missing. Install with: pip install cloudscraper")
-
-from bs4 import BeautifulSoup, Comment
+import time
+import contextlib
+from collections import namedtuple
+from datetime import date
+
+# No network stack at import time: cloudscraper (session.py), httpx
+# (async_fetch.py) and Selenium (browser_pool.py) load on the first fetch, so
+# parse-only / offline runs never pay for them. `python src/bench.py --imports`
+# checks this and the import-time budget.
+from bs4 import BeautifulSoup, NavigableString, CData, Tag
+
+import cache
+import sink
+import store
+import metrics
+import session
+import fragments
+import ratelimit
+from dates import try_parse_date
+import browser_pool
 
 # ---------------- CONFIG ----------------
 URL = "https://fbref.com/en/players/b66315ae/Gabriel-Jesus"  # change this to any player page
 THIS_DIR = os.path.dirname(__file__)
 DATA_DIR = os.path.join(THIS_DIR, "..", "data")
 OUTPUT_CSV = os.path.join(DATA_DIR, "output.csv")
+OUTPUT_DB = os.path.join(DATA_DIR, "players.db")
+OUTPUT_PARQUET = os.path.join(DATA_DIR, "output.parquet")
 DEBUG_HTML = os.path.join(THIS_DIR, "page.html")
+STATS_DIR = os.path.join(DATA_DIR, "stats")
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
@@ -28,56 +41,38 @@ HEADERS = {
 }
 # Toggle this to True to parse the existing page.html (skip fetching)
 USE_EXISTING_PAGE_IF_PRESENT = False
+# Overwrite page.html with every fetched page (batch mode turns this off)
+SAVE_DEBUG_HTML = True
+# Also pull the season stats tables into STATS_DIR (see tables.py)
+EXTRACT_STATS_TABLES = False
+# Also write OUTPUT_PARQUET at the end of a run (needs pyarrow)
+WRITE_PARQUET = False
+# "sqlite": rows go to OUTPUT_DB (see store.py; `python src/store.py export`
+# gives the CSV); "csv": straight to OUTPUT_CSV (see sink.py)
+OUTPUT_FORMAT = "sqlite"
+# Parse only <head> .. end of #meta first; full parse only if a field is missed
+FAST_PARSE = True
+# Serve/revalidate pages from the on-disk cache in data/cache (see cache.py)
+USE_PAGE_CACHE = True
+# "cloudscraper", or "http2" for the asyncio/httpx backend (see async_fetch.py)
+FETCH_BACKEND = "cloudscraper"
+# "bs4" (BeautifulSoup), or "lxml" for the XPath extractor (see xpath_extract.py):
+# same rows, several times faster
+EXTRACT_BACKEND = "bs4"
 # ----------------------------------------
 
 def ensure_data_dir():
     os.makedirs(DATA_DIR, exist_ok=True)
 
 def save_debug(html):
-    with open(DEBUG_HTML, "w", encoding="utf-8") as f:
+    # html: UTF-8 bytes as fetched
+    if not SAVE_DEBUG_HTML:
+        return
+    with open(DEBUG_HTML, "wb") as f:
         f.write(html)
     print("Saved debug HTML to:", DEBUG_HTML)
 
 # ---------- Date helpers ----------
-def try_parse_date(s):
-    if not s:
-        return None
-    s = s.strip()
-    # normalize few variants
-    s = s.replace("\xa0", " ")
-    # common formats
-    for fmt in ("%Y-%m-%d", "%Y/%m/%d", "%d %B %Y", "%d %b %Y", "%B %d, %Y", "%b %d, %Y", "%B %Y", "%b %Y"):
-        try:
-            return datetime.strptime(s, fmt).date()
-        except Exception:
-            pass
-    # month year like "June 2027"
-    m = re.search(r'([A-Za-z]+)\s+(\d{4})', s)
-    if m:
-        try:
-            return datetime.strptime(m.group(0), "%B %Y").date()
-        except Exception:
-            try:
-                return datetime.strptime(m.group(0), "%b %Y").date()
-            except Exception:
-                pass
-    # yyyy-mm-dd anywhere
-    m2 = re.search(r'(\d{4}-\d{2}-\d{2})', s)
-    if m2:
-        try:
-            return datetime.strptime(m2.group(1), "%Y-%m-%d").date()
-        except Exception:
-            pass
-    # dd Month yyyy or similar inside text
-    m3 = re.search(r'(\d{1,2}\s+[A-Za-z]{3,9}\s+\d{4})', s)
-    if m3:
-        for fmt in ("%d %B %Y", "%d %b %Y"):
-            try:
-                return datetime.strptime(m3.group(1), fmt).date()
-            except Exception:
-                pass
-    return None
-
 def compute_age(birth_date):
     if not isinstance(birth_date, date):
         return None
@@ -85,146 +80,388 @@ def compute_age(birth_date):
     yrs = today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
     return str(yrs)
 
+# ---------- Shared by the HTTP backends ----------
+# rotated per request; the session (and its cookies) stays the same
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:124.0) Gecko/20100101 Firefox/124.0",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 13_6) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.6 Safari/605.1.15",
+]
+
+def cache_lookup(url):
+    # (cached entry or None, conditional headers); cached["fresh"] means
+    # serve it without asking the server
+    if not USE_PAGE_CACHE:
+        return None, {}
+    cached = cache.get_page_cache().get(url)
+    conditional = {}
+    if cached and cached["fresh"]:
+        print("[cache] hit:", url)
+        metrics.count("page_cache", "hit")
+        return cached, conditional
+    metrics.count("page_cache", "stale" if cached else "miss")
+    if cached:
+        # stale copy: ask the server whether it changed
+        if cached["etag"]:
+            conditional["If-None-Match"] = cached["etag"]
+        if cached["last_modified"]:
+            conditional["If-Modified-Since"] = cached["last_modified"]
+    return cached, conditional
+
+def accept_response(url, r, cached):
+    # page bytes for a 200 (or a 304 on a cached page), else None;
+    # works with requests/cloudscraper and httpx responses alike
+    status = getattr(r, "status_code", None)
+    if status == 304 and cached:
+        print("[cache] not modified:", url)
+        metrics.count("page_cache", "not_modified")
+        cache.get_page_cache().mark_revalidated(url)
+        return cached["body"]
+    if status == 200:
+        # keep the body as bytes: r.text would decode it into a str that
+        # takes up to 4x the memory (the pages are mostly ASCII, not all)
+        utf8 = (r.encoding or "utf-8").lower() in ("utf-8", "utf8")
+        body = r.content if utf8 else r.text.encode("utf-8")
+        save_debug(body)
+        if USE_PAGE_CACHE:
+            cache.get_page_cache().put(url, body, r.headers.get("ETag"), r.headers.get("Last-Modified"))
+        return body
+    return None
+
+def save_last_response(body):
+    # the last failed response, for debugging
+    if body and SAVE_DEBUG_HTML:
+        try:
+            with open(DEBUG_HTML, "wb") as f:
+                f.write(body)
+            print("Saved last response to debug HTML:", DEBUG_HTML)
+        except Exception:
+            pass
+
 # ---------- Fetch with cloudscraper (faster) ----------
-def fetch_html_cloudscraper(url, attempts=3):
-    import random, time
+def fetch_html_cloudscraper(url, attempts=3, lookup=None):
+    # lookup: cache_lookup(url) if the caller already did it
+    import random
     from urllib.parse import urlparse
 
-    user_agents = [
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:124.0) Gecko/20100101 Firefox/124.0",
-        "Mozilla/5.0 (Macintosh; Intel Mac OS X 13_6) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.6 Safari/605.1.15",
-    ]
-
     last_status = None
-    last_text = None
+    last_body = None
+
+    cached, conditional = lookup or cache_lookup(url)
+    if cached and cached["fresh"]:
+        return cached["body"]
+
+    def accept(r):
+        return accept_response(url, r, cached)
+
+    scraper = session.get_scraper()
+    parsed = urlparse(url)
+    host = parsed.netloc
+    root = f"{parsed.scheme}://{host}/"
+    # pacing, Retry-After and the per-host circuit breaker (see ratelimit.py);
+    # raises CircuitOpen right away while the host is paused
+    limiter = ratelimit.for_host(host)
+
+    def get(target, headers, timeout, stage="fetch_attempt"):
+        with metrics.timer("rate_wait"):
+            limiter.acquire()
+        generation = limiter.generation
+        try:
+            with metrics.timer(stage):
+                r = scraper.get(target, headers=headers, timeout=timeout)
+        except Exception:
+            limiter.record(None, generation=generation)
+            metrics.count("http_status", "error")
+            raise
+        status = getattr(r, "status_code", None)
+        limiter.record(status, r.headers.get("Retry-After"), generation)
+        metrics.count("http_status", str(status))
+        return r
 
     for attempt in range(1, attempts + 1):
-        ua = random.choice(user_agents)
+        # rotate the UA per request; the session (and its cookies) stays the same
+        ua = random.choice(USER_AGENTS)
         headers_try = HEADERS.copy()
         headers_try["User-Agent"] = ua
+        headers_try.update(conditional)
         try:
             print(f"[cloudscraper] Attempt {attempt} with UA: {ua[:60]}...")
-            scraper = cloudscraper.create_scraper(browser={'browser':'chrome','platform':'windows','mobile': False})
-            scraper.headers.update(headers_try)
-            r = scraper.get(url, timeout=20)
+            r = get(url, headers_try, 20)
             last_status = getattr(r, "status_code", None)
-            last_text = getattr(r, "text", "")
+            last_body = getattr(r, "content", b"")
             print("[cloudscraper] Status:", last_status)
-            if last_status == 200:
-                save_debug(r.text)
-                return r.text
-            if last_status == 403:
+            html = accept(r)
+            if html is not None:
+                return html
+            if last_status == 403 and session.needs_warmup(host):
                 # try visiting site root for cookies then retry quickly
-                parsed = urlparse(url)
-                root = f"{parsed.scheme}://{parsed.netloc}/"
                 try:
                     print("[cloudscraper] 403 -> visiting root to gather cookies...")
-                    scraper.get(root, timeout=10)
-                    time.sleep(0.5)
-                    r2 = scraper.get(url, timeout=20)
+                    get(root, headers_try, 10, stage="root_warmup")
+                    session.mark_warmed(host)
+                    r2 = get(url, headers_try, 20)
                     last_status = getattr(r2, "status_code", None)
-                    last_text = getattr(r2, "text", "")
+                    last_body = getattr(r2, "content", b"")
                     print("[cloudscraper] after root visit status:", last_status)
-                    if last_status == 200:
-                        save_debug(r2.text)
-                        return r2.text
+                    html = accept(r2)
+                    if html is not None:
+                        return html
+                except ratelimit.CircuitOpen:
+                    raise
                 except Exception as e:
                     print("[cloudscraper] root visit failed:", e)
-            time.sleep(0.5 * attempt)
+        except ratelimit.CircuitOpen:
+            raise
         except Exception as e:
             print("[cloudscraper] attempt exception:", e)
-            time.sleep(0.5 * attempt)
-    # save last text for debugging
-    if last_text:
-        try:
-            with open(DEBUG_HTML, "w", encoding="utf-8") as f:
-                f.write(last_text)
-            print("Saved last response to debug HTML:", DEBUG_HTML)
-        except Exception:
-            pass
+    save_last_response(last_body)
     raise RuntimeError(f"cloudscraper failed; last status: {last_status}")
 
-# ---------- Selenium fallback (fixed init, minimal wait) ----------
-def fetch_html_selenium(url, headless=False, wait_seconds=4):
-    from selenium import webdriver
-    from selenium.webdriver.chrome.options import Options
-    from selenium.webdriver.chrome.service import Service
-    from webdriver_manager.chrome import ChromeDriverManager
-    import time
-
-    opts = Options()
-    if headless:
-        opts.add_argument("--headless=new")
-    opts.add_argument("--disable-gpu")
-    opts.add_argument("--no-sandbox")
-    opts.add_argument("--disable-dev-shm-usage")
-    opts.add_argument("--window-size=1200,900")
-    opts.add_argument("--disable-blink-features=AutomationControlled")
-    opts.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
-
-    print("[selenium] Starting Chrome (real browser). If a CAPTCHA appears, solve it in the browser window.")
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=opts)
-
-    try:
-        driver.get(url)
-        time.sleep(wait_seconds)
-        html = driver.page_source
-        save_debug(html)
-        return html
-    finally:
-        try:
-            driver.quit()
-        except Exception:
-            pass
+# ---------- Selenium fallback (pooled browsers, waits for #meta) ----------
+def fetch_html_selenium(url, headless=False, wait_seconds=browser_pool.READY_TIMEOUT):
+    # wait_seconds is an upper bound now: we return as soon as #meta shows up.
+    # A challenge page is an error, never a result; only pages with #meta are
+    # cached (a 404 or other page without it is returned but fetched again)
+    pool = browser_pool.get_browser_pool(headless=headless)
+    page = pool.fetch(url, timeout=wait_seconds)
+    if browser_pool.is_challenge(page):
+        raise browser_pool.PageNotReady(f"{url}: browser got a challenge page")
+    html = page.encode("utf-8")
+    save_debug(html)
+    if USE_PAGE_CACHE and b'id="meta"' in html:
+        cache.get_page_cache().put(url, html)
+    return html
+
+# ---------- Field rules ----------
+# Every pattern the extractors use, compiled once.
+# A labelled line of the meta block ("Born: ...", "Height: ...") that passes
+# LABEL_RE is checked against each LABEL_RULES entry; all rules that match
+# fill their <field>_raw key (a later line overwrites an earlier one).
+# TEXT_RULES fill raw keys no label provided from the fragment text. A field
+# with FRAGMENT_RULES takes its labelled value as is, else the first of its
+# rules that finds something in the fragment text, and PAGE_TEXT_RULES are
+# the last resort over the whole page text for fields still missing. The
+# fragment and page rules pass group 1 of their match (stripped) through
+# their normalise function.
+LABEL_RE = re.compile(r'(born|birth|weight|height|nationalit|foot|position|place of birth|contract|debut|born:)', re.I)
+HEIGHT_RE = re.compile(r'(\d{2,3}\s?cm|\d\.\d+\s?m)', re.I)
+WEIGHT_RE = re.compile(r'(\d{2,3}\s?kg)', re.I)
+DOB_RE = re.compile(r'(\d{1,2}\s+\w+\s+\d{4}|\d{4}-\d{2}-\d{2}|\w+\s+\d{4})')
+EXPIRES_RE = re.compile(r'Expires\s+([A-Za-z0-9,\s\-]+?)(?:\.|Via|$)', re.I)
+CONTRACT_RE = re.compile(r'Contract(?:\s+until|\s*[:])\s*([A-Za-z0-9,\s\-]+?)(?:\.|$)', re.I)
+EXPIRES_MONTH_RE = re.compile(r'Expires\s+([A-Za-z]+\s+\d{4})', re.I)
+DEBUT_LINE_RE = re.compile(r'^(.*\bdebut\b.*)$', re.I | re.M)
+DEBUT_LABEL_RE = re.compile(r'^[A-Za-z ]*debut[:\s\-]*', re.I)
+DEBUT_LOOSE_RE = re.compile(r'(Debut[:\s]*[A-Za-z0-9,\s\-]+)', re.I)
+DEBUT_PAGE_RE = re.compile(r'\bDebut[:\s\-]*([A-Za-z0-9,\s\-]+)', re.I)
+FOOTED_RE = re.compile(r'Footed[:\s]*([A-Za-z\-]+)', re.I)
+FOOT_ANY_RE = re.compile(r'(?:Preferred\s*Foot|Footed|Footedness|Foot)[:\s]+([A-Za-z\-]+)', re.I)
+POSITION_RE = re.compile(r'Position[:\s]*(.+?)(?:Foot|Footed|Footedness|$)', re.I)
+BIRTHPLACE_IN_RE = re.compile(r'^\s*in\s+', re.I)
+
+# the row's fields, in output order
+FIELDS = tuple(k for k in sink.HEADER if k != "source_url")
+
+# normalisers for the fragment / page text rules
+def iso_date_or_text(s):
+    d = try_parse_date(s)
+    return d.isoformat() if d else s
+
+def debut_line(line):
+    # a whole "... debut ..." line: its date, else the line minus its label
+    d = try_parse_date(line)
+    return d.isoformat() if d else DEBUT_LABEL_RE.sub('', line).strip()
+
+def after_label(s):
+    return iso_date_or_text(s.split(":", 1)[-1].strip())
+
+# label_re is searched in the label (lowercased text before the ":"), line_re
+# in the whole lowercased line (None: not checked); either one matching is
+# enough. or_line: store the whole line if the value is empty
+LabelRule = namedtuple("LabelRule", "key label_re line_re or_line")
+LABEL_RULES = (
+    LabelRule("dob_raw", re.compile("born"), None, False),
+    LabelRule("birthplace_raw", re.compile("birth.*place|place.*birth"), None, False),
+    LabelRule("height_raw", re.compile("height"), None, False),
+    LabelRule("weight_raw", re.compile("weight"), None, False),
+    LabelRule("nationality_raw", re.compile("nationalit"), None, False),
+    LabelRule("position_raw", re.compile("^position"), None, False),
+    LabelRule("preferred_foot_raw", re.compile("foot"), None, False),
+    LabelRule("contract_until_raw", re.compile("contract"), re.compile("expires"), True),
+    LabelRule("debut_raw", None, re.compile("debut"), True),
+)
+TEXT_RULES = (
+    ("height_raw", HEIGHT_RE),
+    ("weight_raw", WEIGHT_RE),
+    ("dob_raw", DOB_RE),
+)
+# text: "flat" (the fragment's strings joined by spaces) or "lines" (one per line)
+FragmentRule = namedtuple("FragmentRule", "key pattern text normalise")
+FRAGMENT_RULES = (
+    FragmentRule("contract_until", EXPIRES_RE, "flat", iso_date_or_text),
+    FragmentRule("contract_until", CONTRACT_RE, "flat", iso_date_or_text),
+    FragmentRule("contract_until", EXPIRES_MONTH_RE, "flat", iso_date_or_text),
+    FragmentRule("debut", DEBUT_LINE_RE, "lines", debut_line),
+    FragmentRule("debut", DEBUT_LOOSE_RE, "lines", after_label),
+)
+FRAGMENT_RULE_KEYS = tuple(dict.fromkeys(rule.key for rule in FRAGMENT_RULES))
+# hints: words that must occur in the raw HTML for a pattern to have a chance
+PageTextRule = namedtuple("PageTextRule", "key patterns hints normalise")
+PAGE_TEXT_RULES = (
+    PageTextRule("contract_until", (EXPIRES_RE, CONTRACT_RE),
+                 ("expires", "Expires", "EXPIRES", "contract", "Contract", "CONTRACT"), iso_date_or_text),
+    PageTextRule("debut", (DEBUT_PAGE_RE,), ("debut", "Debut", "DEBUT"), iso_date_or_text),
+)
 
 # ---------- Parsing helpers & extractors ----------
-def extract_born_section(soup):
-    born_tag = soup.find("strong", string=lambda s: s and "born" in s.lower())
-    if not born_tag:
+STRONG_LABELS = ("born", "foot", "position")
+ITEMPROPS = ("height", "weight", "nationality", "birthPlace")
+
+class PageScan:
+    # Everything extract_player needs from the meta fragment, collected in one
+    # walk over it. Whole-document lookups only happen when the fragment
+    # doesn't have the answer, and the full page text is built at most once.
+    def __init__(self, soup, fragment=None):
+        self.soup = soup
+        self.strings = []       # same strings get_text(strip=True) would join
+        self.anchors = []       # (text, href) in document order
+        self.strong = {}        # label keyword -> first <strong> whose text contains it
+        self.itemprop = {}      # itemprop name -> first <span> carrying it
+        self._whole_text = None
+        self.has_fragment = fragment is not None
+        if fragment is not None:
+            self._walk(fragment)
+        self.text_lines = "\n".join(self.strings)
+        self.text_flat = " ".join(self.strings)
+
+    def _walk(self, fragment):
+        string_types = (NavigableString, CData)
+        for node in fragment.descendants:
+            if isinstance(node, Tag):
+                if node.name == "a":
+                    self.anchors.append((node.get_text(strip=True), node.get("href", "")))
+                elif node.name == "strong":
+                    label = node.string
+                    if label:
+                        label = label.lower()
+                        for kw in STRONG_LABELS:
+                            if kw in label and kw not in self.strong:
+                                self.strong[kw] = node
+                elif node.name == "span":
+                    prop = node.get("itemprop")
+                    if prop in ITEMPROPS and prop not in self.itemprop:
+                        self.itemprop[prop] = node
+            elif type(node) in string_types:
+                txt = node.strip()
+                if txt:
+                    self.strings.append(txt)
+
+    def find_strong(self, keyword):
+        tag = self.strong.get(keyword)
+        if tag is None:
+            tag = self.soup.find("strong", string=lambda s: s and keyword in s.lower())
+        return tag
+
+    def find_itemprop(self, name):
+        tag = self.itemprop.get(name)
+        if tag is None:
+            tag = self.soup.find("span", {"itemprop": name})
+        return tag
+
+    @property
+    def whole_text(self):
+        if self._whole_text is None:
+            with metrics.timer("extract.page_text"):
+                self._whole_text = self.soup.get_text(" ", strip=True)
+        return self._whole_text
+
+    # what extract_fields reads; the lxml backend (xpath_extract.LxmlScan)
+    # answers the same questions with XPath
+    def heading(self):
+        h1 = self.soup.find("h1")
+        return h1.get_text(strip=True) if h1 else None
+
+    def json_ld(self):
+        return parse_json_ld(self.soup)
+
+    def strong_parent_text(self, keyword):
+        tag = self.find_strong(keyword)
+        return tag.parent.get_text(" ", strip=True) if tag else None
+
+    def born_spans(self):
+        # (text of the first <span> after "Born", text of the one after that);
+        # None if there is no "Born" label
+        born_tag = self.find_strong("born")
+        if not born_tag:
+            return None
+        date_span = born_tag.find_next("span")
+        bp_span = date_span.find_next("span") if date_span else None
+        return (date_span.get_text(strip=True) if date_span else None,
+                bp_span.get_text(strip=True) if bp_span else None)
+
+    def itemprop_text(self, name):
+        tag = self.find_itemprop(name)
+        return tag.get_text(strip=True) if tag else None
+
+def _page_scan(soup, fragment=None, scan=None):
+    return scan if scan is not None else PageScan(soup, fragment)
+
+def _fragment_scan(fragment):
+    # extractors below take either a fragment or a ready PageScan
+    return fragment if isinstance(fragment, PageScan) else PageScan(None, fragment)
+
+@metrics.timed("extract.born_section")
+def extract_born_section(soup, scan=None):
+    spans = _page_scan(soup, scan=scan).born_spans()
+    if spans is None:
         return None, None
-    date_span = born_tag.find_next("span")
-    dob_raw = date_span.get_text(strip=True) if date_span else None
-    bp_span = date_span.find_next("span") if date_span else None
+    dob_raw, bp_txt = spans
     birthplace = None
-    if bp_span:
-        bp_txt = bp_span.get_text(strip=True)
-        bp_txt = re.sub(r'^\s*in\s+', '', bp_txt, flags=re.I).strip()
+    if bp_txt is not None:
+        bp_txt = BIRTHPLACE_IN_RE.sub('', bp_txt).strip()
         if bp_txt:
             birthplace = bp_txt
     parsed = try_parse_date(dob_raw)
     dob = parsed.isoformat() if parsed else dob_raw
     return dob, birthplace
 
-def extract_preferred_foot(soup):
-    foot_tag = soup.find("strong", string=lambda s: s and "foot" in s.lower())
-    if foot_tag:
-        parent_text = foot_tag.parent.get_text(" ", strip=True)
-        m = re.search(r'Footed[:\s]*([A-Za-z\-]+)', parent_text, re.I)
+@metrics.timed("extract.preferred_foot")
+def extract_preferred_foot(soup, scan=None):
+    scan = _page_scan(soup, scan=scan)
+    parent_text = scan.strong_parent_text("foot")
+    if parent_text is not None:
+        m = FOOTED_RE.search(parent_text)
         if m:
             return m.group(1).strip()
-    txt_all = soup.get_text(" ", strip=True)
-    m = re.search(r'(?:Preferred\s*Foot|Footed|Footedness|Foot)[:\s]+([A-Za-z\-]+)', txt_all, re.I)
+    txt_all = scan.whole_text
+    m = FOOT_ANY_RE.search(txt_all)
     if m:
         return m.group(1).strip()
     return None
 
-def extract_position(soup):
-    pos_tag = soup.find("strong", string=lambda s: s and "position" in s.lower())
-    if pos_tag:
-        parent_text = pos_tag.parent.get_text(" ", strip=True)
-        m = re.search(r'Position[:\s]*(.+?)(?:Foot|Footed|Footedness|$)', parent_text, re.I)
+@metrics.timed("extract.position")
+def extract_position(soup, scan=None):
+    parent_text = _page_scan(soup, scan=scan).strong_parent_text("position")
+    if parent_text is not None:
+        m = POSITION_RE.search(parent_text)
         if m:
             return m.group(1).strip().rstrip('▪').strip()
         return parent_text.replace("Position:", "").strip()
     return None
 
+@metrics.timed("extract.json_ld")
 def parse_json_ld(soup):
-    scripts = soup.find_all("script", type="application/ld+json")
-    for s in scripts:
+    # FBref puts JSON-LD in <head>; only walk the whole page if it isn't there
+    scripts = soup.head.find_all("script", type="application/ld+json") if soup.head else []
+    if not scripts:
+        scripts = soup.find_all("script", type="application/ld+json")
+    return pick_json_ld(s.string for s in scripts)
+
+def pick_json_ld(texts):
+    # the first Person / player entry in the bodies of the JSON-LD scripts
+    for text in texts:
         try:
-            data = json.loads(s.string)
+            data = json.loads(text)
         except Exception:
             continue
         if isinstance(data, list):
@@ -239,12 +476,10 @@ def parse_json_ld(soup):
                 return data
     return None
 
+@metrics.timed("extract.label_values")
 def extract_label_values(fragment):
-    LABEL_RE = re.compile(r'(born|birth|weight|height|nationalit|foot|position|place of birth|contract|debut|born:)', re.I)
-    HEIGHT_RE = re.compile(r'(\d{2,3}\s?cm|\d\.\d+\s?m)', re.I)
-    WEIGHT_RE = re.compile(r'(\d{2,3}\s?kg)', re.I)
-    DOB_RE = re.compile(r'(\d{1,2}\s+\w+\s+\d{4}|\d{4}-\d{2}-\d{2}|\w+\s+\d{4})')
-    text = fragment.get_text(separator="\n", strip=True)
+    scan = _fragment_scan(fragment)
+    text = scan.text_lines
     lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
     out = {}
     for ln in lines:
@@ -258,41 +493,18 @@ def extract_label_values(fragment):
             parts = ln.split(None,1)
             label = parts[0].strip().lower() if parts else ln
             val = parts[1].strip() if len(parts)>1 else ""
-        if "born" in label:
-            out["dob_raw"] = val
-        if ("birth" in label and "place" in label) or "birthplace" in label:
-            out["birthplace_raw"] = val
-        if "height" in label:
-            out["height_raw"] = val
-        if "weight" in label:
-            out["weight_raw"] = val
-        if "nationalit" in label:
-            out["nationality_raw"] = val
-        if label.strip().startswith("position"):
-            out["position_raw"] = val
-        if "foot" in label:
-            out["preferred_foot_raw"] = val
-        if "contract" in label or "expires" in ln.lower():
-            # capture the portion after label or the whole line
-            out["contract_raw"] = val if val else ln
-        if "debut" in label or "debut" in ln.lower():
-            out["debut_raw"] = val if val else ln
-    if "height_raw" not in out:
-        hm = HEIGHT_RE.search(text)
-        if hm:
-            out["height_raw"] = hm.group(1)
-    if "weight_raw" not in out:
-        wm = WEIGHT_RE.search(text)
-        if wm:
-            out["weight_raw"] = wm.group(1)
-    if "dob_raw" not in out:
-        dm = DOB_RE.search(text)
-        if dm:
-            out["dob_raw"] = dm.group(1)
+        low = ln.lower()
+        for rule in LABEL_RULES:
+            if ((rule.label_re is not None and rule.label_re.search(label))
+                    or (rule.line_re is not None and rule.line_re.search(low))):
+                out[rule.key] = val if val or not rule.or_line else ln
+    for key, rx in TEXT_RULES:
+        if key not in out:
+            m = rx.search(text)
+            if m:
+                out[key] = m.group(1)
     nation = None
-    for a in fragment.find_all("a"):
-        txt = a.get_text(strip=True)
-        href = a.get("href","")
+    for txt, href in scan.anchors:
         if txt and txt[0].isupper() and len(txt) < 60 and "players" not in href and "teams" not in href:
             nation = txt
             break
@@ -300,83 +512,63 @@ def extract_label_values(fragment):
         out["nationality_raw"] = nation
     return out
 
+META_COMMENT_NEEDLES = ('id="meta"', 'data-birth', 'itemprop', 'Born')
+
+@metrics.timed("find_meta_fragment")
 def find_meta_fragment(soup):
     meta = soup.find(id="meta")
     if meta:
         return meta, "meta_id"
-    for comment in soup.find_all(string=lambda t: isinstance(t, Comment)):
-        txt = comment.strip()
-        if 'id="meta"' in txt or 'data-birth' in txt or 'itemprop' in txt or 'Born' in txt:
-            frag = BeautifulSoup(txt, "lxml")
-            return frag, "meta_in_comment"
+    # comments are indexed once per soup and their parses cached (fragments.py)
+    index = fragments.soup_index(soup)
+    hits = index.containing(META_COMMENT_NEEDLES)
+    if hits:
+        return index.parsed(hits[0]), "meta_in_comment"
     return None, None
 
-# ---- new: extract contract and debut helpers ----
-def extract_contract_from_fragment(fragment):
-    # try to find phrases like "Expires June 2027" or "Contract until <date>"
-    txt = fragment.get_text(" ", strip=True)
-    # common patterns
-    m = re.search(r'Expires\s+([A-Za-z0-9,\s\-]+?)(?:\.|Via|$)', txt, re.I)
-    if m:
-        candidate = m.group(1).strip()
-        d = try_parse_date(candidate)
-        return (d.isoformat() if d else candidate)
-    m2 = re.search(r'Contract(?:\s+until|\s*[:])\s*([A-Za-z0-9,\s\-]+?)(?:\.|$)', txt, re.I)
-    if m2:
-        candidate = m2.group(1).strip()
-        d = try_parse_date(candidate)
-        return (d.isoformat() if d else candidate)
-    # maybe line contains "Expires <month year>"
-    m3 = re.search(r'(Expires\s+[A-Za-z]+\s+\d{4})', txt, re.I)
-    if m3:
-        candidate = m3.group(1).replace("Expires", "").strip()
-        d = try_parse_date(candidate)
-        return (d.isoformat() if d else candidate)
-    return None
-
-def extract_debut_from_fragment(fragment):
-    # look for lines containing debut or "Senior debut" etc.
-    txt = fragment.get_text("\n", strip=True)
-    lines = [ln.strip() for ln in txt.splitlines() if ln.strip()]
-    for ln in lines:
-        if re.search(r'\bdebut\b', ln, re.I):
-            # try to extract a date from the line
-            d = try_parse_date(ln)
-            if d:
-                return d.isoformat()
-            # otherwise return cleaned snippet
-            # remove leading label like "Debut:" or "Senior debut:"
-            ln2 = re.sub(r'^[A-Za-z ]*debut[:\s\-]*', '', ln, flags=re.I).strip()
-            return ln2
-    # try a looser search in whole fragment
-    m = re.search(r'(Debut[:\s]*[A-Za-z0-9,\s\-]+)', txt, re.I)
-    if m:
-        candidate = m.group(1).split(":",1)[-1].strip()
-        d = try_parse_date(candidate)
-        return (d.isoformat() if d else candidate)
+@metrics.timed("extract.fragment_rules")
+def fragment_rule_value(fragment, key):
+    # the first non-empty value key's FRAGMENT_RULES find, else None
+    scan = _fragment_scan(fragment)
+    for rule in FRAGMENT_RULES:
+        if rule.key != key:
+            continue
+        m = rule.pattern.search(scan.text_flat if rule.text == "flat" else scan.text_lines)
+        if m:
+            val = rule.normalise(m.group(1).strip())
+            if val:
+                return val
     return None
 
 # ---------- main extraction combining everything ----------
-def extract_player(soup, meta_fragment):
-    info = {
-        "name": "Not Found",
-        "dob": "Not Found",
-        "age": "Not Found",
-        "height": "Not Found",
-        "weight": "Not Found",
-        "nationality": "Not Found",
-        "position": "Not Found",
-        "preferred_foot": "Not Found",
-        "birthplace": "Not Found",
-        "debut": "Not Found",            # new
-        "contract_until": "Not Found"    # new
-    }
-
-    h1 = soup.find("h1")
-    if h1:
-        info["name"] = h1.get_text(strip=True)
-
-    jl = parse_json_ld(soup)
+def _credit(info, prev, sources, source):
+    # remember which step last changed each field
+    for k, v in info.items():
+        if v != prev.get(k):
+            sources[k] = source
+    prev.update(info)
+
+@metrics.timed("extract_player")
+def extract_player(soup, meta_fragment, sources=None):
+    # sources, if given, is filled with field -> step that produced it
+    # one walk over the meta fragment; everything else reads from it
+    with metrics.timer("extract.meta_scan"):
+        scan = PageScan(soup, meta_fragment)
+    return extract_fields(scan, sources)
+
+def extract_fields(scan, sources=None):
+    # the field rules, over a PageScan (or xpath_extract.LxmlScan)
+    sources = {} if sources is None else sources
+    info = dict.fromkeys(FIELDS, "Not Found")
+
+    prev = dict(info)
+
+    name = scan.heading()
+    if name is not None:
+        info["name"] = name
+    _credit(info, prev, sources, "h1")
+
+    jl = scan.json_ld()
     if jl:
         if jl.get("birthDate"):
             info["dob"] = jl.get("birthDate")
@@ -396,10 +588,11 @@ def extract_player(soup, meta_fragment):
             info["nationality"] = jl.get("nationality")
         if jl.get("roleName"):
             info["position"] = jl.get("roleName")
+        _credit(info, prev, sources, "json_ld")
 
     # try parse meta fragment / comment fragment
-    if meta_fragment is not None:
-        candidates = extract_label_values(meta_fragment)
+    if scan.has_fragment:
+        candidates = extract_label_values(scan)
         # basic fields
         if candidates.get("dob_raw") and info["dob"] == "Not Found":
             dr = candidates["dob_raw"].strip()
@@ -408,8 +601,9 @@ def extract_player(soup, meta_fragment):
                 bd = try_parse_date(dr)
                 if bd:
                     info["age"] = compute_age(bd)
+        _credit(info, prev, sources, "meta_labels")
         if info["dob"] == "Not Found":
-            dob_val, bp_val = extract_born_section(soup)
+            dob_val, bp_val = extract_born_section(None, scan)
             if dob_val:
                 info["dob"] = dob_val
                 bd = try_parse_date(dob_val)
@@ -417,6 +611,7 @@ def extract_player(soup, meta_fragment):
                     info["age"] = compute_age(bd)
             if bp_val and info["birthplace"] == "Not Found":
                 info["birthplace"] = bp_val
+            _credit(info, prev, sources, "born_section")
         if candidates.get("birthplace_raw") and info["birthplace"] == "Not Found":
             if candidates["birthplace_raw"].strip() and candidates["birthplace_raw"].strip() != ":":
                 info["birthplace"] = candidates["birthplace_raw"]
@@ -427,75 +622,56 @@ def extract_player(soup, meta_fragment):
         if candidates.get("nationality_raw") and info["nationality"] == "Not Found":
             info["nationality"] = candidates["nationality_raw"]
 
-        # NEW: contract and debut attempts from fragment
-        cval = None
-        if candidates.get("contract_raw"):
-            cval = candidates.get("contract_raw")
-        if not cval:
-            cval = extract_contract_from_fragment(meta_fragment)
-        if cval:
-            info["contract_until"] = cval if isinstance(cval, str) else str(cval)
-
-        dval = None
-        if candidates.get("debut_raw"):
-            dval = candidates.get("debut_raw")
-        if not dval:
-            dval = extract_debut_from_fragment(meta_fragment)
-        if dval:
-            info["debut"] = dval if isinstance(dval, str) else str(dval)
-
-    # fallback scan of whole page text (if missing)
-    whole_text = soup.get_text(" ", strip=True)
-    if info["contract_until"] == "Not Found":
-        # patterns across whole page
-        m = re.search(r'Expires\s+([A-Za-z0-9,\s\-]+?)(?:\.|Via|$)', whole_text, re.I)
-        if m:
-            candidate = m.group(1).strip()
-            d = try_parse_date(candidate)
-            info["contract_until"] = d.isoformat() if d else candidate
-        else:
-            m2 = re.search(r'Contract(?:\s+until|\s*[:])\s*([A-Za-z0-9,\s\-]+?)(?:\.|$)', whole_text, re.I)
-            if m2:
-                candidate = m2.group(1).strip()
-                d = try_parse_date(candidate)
-                info["contract_until"] = d.isoformat() if d else candidate
-
-    if info["debut"] == "Not Found":
-        m = re.search(r'\bDebut[:\s\-]*([A-Za-z0-9,\s\-]+)', whole_text, re.I)
-        if m:
-            candidate = m.group(1).strip()
-            d = try_parse_date(candidate)
-            info["debut"] = d.isoformat() if d else candidate
+        # contract, debut, ...: the labelled line as is, else FRAGMENT_RULES
+        for key in FRAGMENT_RULE_KEYS:
+            val = candidates.get(key + "_raw") or fragment_rule_value(scan, key)
+            if val:
+                info[key] = val
+        _credit(info, prev, sources, "meta_labels")
+
+    # fallback scan of whole page text (if missing); built on first use
+    for rule in PAGE_TEXT_RULES:
+        if info[rule.key] != "Not Found":
+            continue
+        for rx in rule.patterns:
+            m = rx.search(scan.whole_text)
+            if m:
+                info[rule.key] = rule.normalise(m.group(1).strip())
+                break
+    _credit(info, prev, sources, "page_text")
 
     # other existing fallbacks for height, weight, nationality, birthplace
     if info["height"] == "Not Found":
-        h = soup.find("span", {"itemprop":"height"})
-        if h:
-            info["height"] = h.get_text(strip=True)
+        h = scan.itemprop_text("height")
+        if h is not None:
+            info["height"] = h
     if info["weight"] == "Not Found":
-        w = soup.find("span", {"itemprop":"weight"})
-        if w:
-            info["weight"] = w.get_text(strip=True)
+        w = scan.itemprop_text("weight")
+        if w is not None:
+            info["weight"] = w
     if info["nationality"] == "Not Found":
-        n = soup.find("span", {"itemprop":"nationality"})
-        if n:
-            info["nationality"] = n.get_text(strip=True)
+        n = scan.itemprop_text("nationality")
+        if n is not None:
+            info["nationality"] = n
     if info["birthplace"] == "Not Found":
-        bp = soup.find("span", {"itemprop":"birthPlace"})
-        if bp:
-            info["birthplace"] = bp.get_text(strip=True)
+        bp = scan.itemprop_text("birthPlace")
+        if bp is not None:
+            info["birthplace"] = bp
+    _credit(info, prev, sources, "itemprop")
 
-    pos = extract_position(soup)
+    pos = extract_position(None, scan)
     if pos:
         info["position"] = pos
-    pf = extract_preferred_foot(soup)
+    pf = extract_preferred_foot(None, scan)
     if pf:
         info["preferred_foot"] = pf
+    _credit(info, prev, sources, "meta_strong")
 
     if info["age"] == "Not Found" and info["dob"] not in (None, "Not Found"):
         parsed = try_parse_date(info["dob"])
         if parsed:
             info["age"] = compute_age(parsed)
+    _credit(info, prev, sources, "derived")
 
     for k in ("height","weight"):
         v = info.get(k)
@@ -516,6 +692,8 @@ def extract_player(soup, meta_fragment):
             else:
                 info[k] = val
 
+    for k, v in info.items():
+        sources[k] = sources.get(k, "missing") if v != "Not Found" else "missing"
     return info
 
 def normalize_quant_val(q):
@@ -532,46 +710,202 @@ def normalize_quant_val(q):
         return q.strip()
     return None
 
-def save_csv(row):
+PLAYER_ID_RE = re.compile(r'/players/([0-9a-f]{8})(?:/|$)')
+
+def player_id_from_url(url):
+    m = PLAYER_ID_RE.search(url or "")
+    return m.group(1) if m else ""
+
+def open_sink():
+    # keep one of these open for a whole batch; see store.py / sink.py
     ensure_data_dir()
-    header = ["name","dob","age","height","weight","nationality","position","preferred_foot","birthplace","debut","contract_until","source_url"]
-    write_header = not os.path.exists(OUTPUT_CSV)
-    with open(OUTPUT_CSV, "a", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=header)
-        if write_header:
-            w.writeheader()
-        w.writerow(row)
-    print("Saved to:", OUTPUT_CSV)
+    parquet = OUTPUT_PARQUET if WRITE_PARQUET else None
+    if OUTPUT_FORMAT == "csv":
+        return sink.CsvSink(OUTPUT_CSV, parquet)
+    new = not os.path.exists(OUTPUT_DB)
+    out = store.PlayerStore(OUTPUT_DB, parquet)
+    if new and os.path.exists(OUTPUT_CSV):
+        # first run with the store: carry the rows scraped so far over
+        print(f"[store] imported {out.import_csv(OUTPUT_CSV)} rows from {OUTPUT_CSV}")
+    return out
+
+def output_path():
+    return OUTPUT_CSV if OUTPUT_FORMAT == "csv" else OUTPUT_DB
+
+def save_csv(row):
+    with open_sink() as out:
+        out.write(row)
+    print("Saved to:", output_path())
+
+def _fetch_network(url, headless, lookup):
+    # (page, backend that got it); lookup: cache_lookup(url), already done
+    try:
+        if FETCH_BACKEND == "http2":
+            import async_fetch
+            return async_fetch.fetch_one(url, lookup), FETCH_BACKEND
+        return fetch_html_cloudscraper(url, lookup=lookup), FETCH_BACKEND
+    except Exception as e:
+        print(f"{FETCH_BACKEND} failed:", e)
+        print("Falling back to Selenium (real browser). This will open Chrome on your machine.")
+        return fetch_html_selenium(url, headless=headless), "selenium"
+
+def fetch_html(url, headless=False, limiter=None):
+    # the page cache, then the HTTP backend (cloudscraper by default), then a
+    # real browser. limiter: a batch.HostLimiter; only pages that need the
+    # network take one of its per-host slots
+    t0 = time.perf_counter()
+    lookup = cache_lookup(url)
+    cached = lookup[0]
+    if cached and cached["fresh"]:
+        html, backend = cached["body"], "cache"
+    else:
+        with limiter.slot(url) if limiter is not None else contextlib.nullcontext():
+            html, backend = _fetch_network(url, headless, lookup)
+    ms = (time.perf_counter() - t0) * 1000
+    metrics.observe("fetch_page", ms)
+    metrics.count("fetch_backend", backend)
+    metrics.event("page_fetched", url=url, backend=backend, ms=round(ms, 2), bytes=len(html))
+    return html
+
+# ---------- Page input: str, UTF-8 bytes or an mmap of them ----------
+# fetch_html returns bytes (a cache hit returns an mmap of the cached file);
+# the parse functions below take any of the three and never decode the whole
+# page into a str themselves.
+def as_markup(html):
+    # str / bytes pass through; an mmap becomes bytes (needed for pickling
+    # and for parsers that can't take a buffer)
+    return html if isinstance(html, (str, bytes)) else html[:]
+
+def make_soup(html):
+    if isinstance(html, str):
+        return BeautifulSoup(html, "lxml")
+    # lxml decodes the bytes itself; no intermediate str of the page
+    return BeautifulSoup(as_markup(html), "lxml", from_encoding="utf-8")
+
+def literal(html, s):
+    # a literal in the same type as html, for find/rfind on str or bytes
+    return s if isinstance(html, str) else s.encode("utf-8")
+
+# ---------- Fast path: parse only the page head + #meta ----------
+META_OPEN_RE = re.compile(r'<div[^>]*\bid="meta"')
+DIV_TAG_RE = re.compile(r'<(/?)div\b', re.I)
+META_OPEN_BYTES_RE = re.compile(META_OPEN_RE.pattern.encode())
+DIV_TAG_BYTES_RE = re.compile(DIV_TAG_RE.pattern.encode(), re.I)
+# fields the full parse can still find outside #meta (whole-page text scan);
+# if none of their hint words occur in the raw HTML it can't, so a miss is final
+PAGE_TEXT_HINTS = {rule.key: rule.hints for rule in PAGE_TEXT_RULES}
+
+def meta_bounds(html):
+    # (start, end) of the live <div id="meta"> .. </div>, or None if #meta
+    # only lives in a comment (or isn't there); works on bytes/mmap too
+    text = isinstance(html, str)
+    m = (META_OPEN_RE if text else META_OPEN_BYTES_RE).search(html)
+    if not m:
+        return None
+    if html.rfind(literal(html, "<!--"), 0, m.start()) > html.rfind(literal(html, "-->"), 0, m.start()):
+        return None
+    depth = 0
+    for tag in (DIV_TAG_RE if text else DIV_TAG_BYTES_RE).finditer(html, m.start()):
+        depth += -1 if tag.group(1) else 1
+        if depth == 0:
+            return m.start(), html.find(literal(html, ">"), tag.end()) + 1
+    return None
+
+def meta_region(html):
+    # everything up to the </div> closing #meta: <head> (JSON-LD), <h1> and the
+    # meta block, usually ~10% of the page (for an mmap, the only part read)
+    bounds = meta_bounds(html)
+    return html[:bounds[1]] if bounds else None
+
+def extract_document(html, sources=None, stage="full", need_meta=False):
+    # parse + find #meta + extract with EXTRACT_BACKEND: (info, meta method);
+    # (None, None) if need_meta and there is no meta block
+    if EXTRACT_BACKEND == "lxml":
+        import xpath_extract
+        return xpath_extract.extract_document(html, sources, stage, need_meta)
+    with metrics.timer("soup_parse." + stage):
+        soup = make_soup(html)
+    meta_frag, method = find_meta_fragment(soup)
+    if meta_frag is None and need_meta:
+        return None, None
+    return extract_player(soup, meta_frag, sources), method
+
+def parse_meta_region(html, sources=None):
+    # (info, meta method) from the fast path, or None if it missed something
+    region = meta_region(html)
+    if region is None:
+        return None
+    info, method = extract_document(region, sources, "meta_region", need_meta=True)
+    if info is None:
+        return None
+    for k, v in info.items():
+        if v != "Not Found":
+            continue
+        hints = PAGE_TEXT_HINTS.get(k)
+        if hints is None or any(html.find(literal(html, h)) >= 0 for h in hints):
+            print(f"Fast parse missed {k}; parsing the full page.")
+            metrics.count("parse_mode", "fast_missed")
+            return None
+    print("Meta discovery method:", method, "(meta region only)")
+    return info, method
+
+def parse_page(html, url):
+    t0 = time.perf_counter()
+    sources = {}
+    fast = parse_meta_region(html, sources) if FAST_PARSE else None
+    if fast is not None:
+        info, method = fast
+        mode = "fast"
+    else:
+        sources.clear()
+        info, method = extract_document(html, sources, "full")
+        print("Meta discovery method:", method)
+        mode = "full"
+    ms = (time.perf_counter() - t0) * 1000
+    metrics.observe("parse_page", ms)
+    metrics.count("parse_mode", mode)
+    metrics.count("meta_method", method or "none")
+    for k, src in sources.items():
+        metrics.count("field_source", f"{k}:{src}")
+    metrics.event("page_parsed", url=url, mode=mode, meta_method=method, ms=round(ms, 2), sources=sources)
+    info["source_url"] = url
+    return info
+
+def parse_stats_tables(html):
+    # None when EXTRACT_STATS_TABLES is off
+    if not EXTRACT_STATS_TABLES:
+        return None
+    import tables
+    return tables.extract_tables(html)
+
+def save_stats_tables(url, stats_tables, writer=None):
+    if not stats_tables:
+        return
+    import tables
+    writer = writer or tables.TableWriter(STATS_DIR)
+    writer.write(player_id_from_url(url), url, stats_tables)
 
 def main():
     # If you already have a debug page saved and want to parse it without fetching,
     # set USE_EXISTING_PAGE_IF_PRESENT = True at the top of this file.
     html = None
-    if USE_EXISTING_PAGE_IF_PRESENT and os.path.exists(DEBUG_HTML):
+    if USE_EXISTING_PAGE_IF_PRESENT and os.path.exists(DEBUG_HTML) and os.path.getsize(DEBUG_HTML):
         print("Parsing existing page.html (skip fetch).")
-        with open(DEBUG_HTML, "r", encoding="utf-8") as f:
-            html = f.read()
+        html = cache.map_file(DEBUG_HTML)
 
     if not html:
-        # try cloudscraper first
-        try:
-            html = fetch_html_cloudscraper(URL)
-        except Exception as e:
-            print("cloudscraper failed:", e)
-            print("Falling back to Selenium (real browser). This will open Chrome on your machine.")
-            html = fetch_html_selenium(URL, headless=False, wait_seconds=4)
+        html = fetch_html(URL)
 
-    soup = BeautifulSoup(html, "lxml")
-    meta_frag, method = find_meta_fragment(soup)
-    print("Meta discovery method:", method)
-    info = extract_player(soup, meta_frag)
-    info["source_url"] = URL
+    info = parse_page(html, URL)
 
     print("\nExtracted fields:")
     for k,v in info.items():
         print(f"{k}: {v}")
 
     save_csv(info)
+    save_stats_tables(URL, parse_stats_tables(html))
+    session.save_cookies()
+    metrics.summary()
 
 if __name__ == "__main__":
     main()
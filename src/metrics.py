@@ -0,0 +1,152 @@
+# src/metrics.py
+# Hot-path timing and counters.
+#
+#   with metrics.timer("soup_parse"):
+#       soup = BeautifulSoup(html, "lxml")
+#   metrics.count("meta_method", "meta_id")
+#   metrics.event("page_parsed", url=url, ms=12.3)
+#
+# Timers go into per-stage log-bucket histograms (cheap, mergeable across
+# processes), counters are (name, label) -> n, and events are written as one
+# JSON object per line to logos/scraper.log. summary() prints p50/p90/p99 per
+# stage at the end of a run and logs the same numbers as a "summary" event.
+import os
+import json
+import math
+import time
+import threading
+from contextlib import contextmanager
+
+# ---------------- CONFIG ----------------
+THIS_DIR = os.path.dirname(__file__)
+LOG_PATH = os.path.join(THIS_DIR, "..", "logos", "scraper.log")
+LOG_EVENTS = True
+BUCKET_BASE = 1.2           # histogram buckets grow by 20%
+MIN_MS = 0.001
+# ----------------------------------------
+
+_lock = threading.Lock()
+_hists = {}                 # stage -> {"n", "sum", "max", "buckets": {i: n}}
+_counts = {}                # (name, label) -> n
+
+def _bucket(ms):
+    return 0 if ms <= MIN_MS else int(math.log(ms / MIN_MS, BUCKET_BASE)) + 1
+
+def _bucket_upper(i):
+    return MIN_MS * BUCKET_BASE ** i
+
+def observe(stage, ms):
+    b = _bucket(ms)
+    with _lock:
+        h = _hists.get(stage)
+        if h is None:
+            h = _hists[stage] = {"n": 0, "sum": 0.0, "max": 0.0, "buckets": {}}
+        h["n"] += 1
+        h["sum"] += ms
+        if ms > h["max"]:
+            h["max"] = ms
+        h["buckets"][b] = h["buckets"].get(b, 0) + 1
+
+@contextmanager
+def timer(stage):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, (time.perf_counter() - t0) * 1000)
+
+def timed(stage):
+    # decorator form of timer()
+    def wrap(fn):
+        def inner(*args, **kwargs):
+            with timer(stage):
+                return fn(*args, **kwargs)
+        inner.__name__ = fn.__name__
+        inner.__doc__ = fn.__doc__
+        inner.__wrapped__ = fn
+        return inner
+    return wrap
+
+def count(name, label="", n=1):
+    with _lock:
+        key = (name, label)
+        _counts[key] = _counts.get(key, 0) + n
+
+def event(name, **fields):
+    if not LOG_EVENTS:
+        return
+    rec = {"ts": round(time.time(), 3), "event": name, "pid": os.getpid()}
+    rec.update(fields)
+    line = json.dumps(rec, ensure_ascii=False, default=str)
+    with _lock:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(LOG_PATH)), exist_ok=True)
+            with open(LOG_PATH, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError:
+            pass
+
+def percentile(h, q):
+    # upper edge of the bucket holding the q-th sample
+    target = q * h["n"]
+    seen = 0
+    for b in sorted(h["buckets"]):
+        seen += h["buckets"][b]
+        if seen >= target:
+            return min(_bucket_upper(b), h["max"])
+    return h["max"]
+
+def snapshot(reset=False):
+    # plain dicts, safe to pickle back from a worker process
+    global _hists, _counts
+    with _lock:
+        snap = {
+            "hists": {k: {"n": v["n"], "sum": v["sum"], "max": v["max"], "buckets": dict(v["buckets"])}
+                      for k, v in _hists.items()},
+            "counts": [[k[0], k[1], v] for k, v in _counts.items()],
+        }
+        if reset:
+            _hists, _counts = {}, {}
+    return snap
+
+def merge(snap):
+    with _lock:
+        for stage, h in snap["hists"].items():
+            mine = _hists.setdefault(stage, {"n": 0, "sum": 0.0, "max": 0.0, "buckets": {}})
+            mine["n"] += h["n"]
+            mine["sum"] += h["sum"]
+            mine["max"] = max(mine["max"], h["max"])
+            for b, n in h["buckets"].items():
+                mine["buckets"][b] = mine["buckets"].get(b, 0) + n
+        for name, label, n in snap["counts"]:
+            _counts[(name, label)] = _counts.get((name, label), 0) + n
+
+def reset():
+    snapshot(reset=True)
+
+def summary(log=True):
+    snap = snapshot()
+    stages = {}
+    for stage, h in sorted(snap["hists"].items()):
+        stages[stage] = {
+            "n": h["n"],
+            "total_ms": round(h["sum"], 2),
+            "mean_ms": round(h["sum"] / h["n"], 3),
+            "p50_ms": round(percentile(h, 0.5), 3),
+            "p90_ms": round(percentile(h, 0.9), 3),
+            "p99_ms": round(percentile(h, 0.99), 3),
+            "max_ms": round(h["max"], 3),
+        }
+    counts = {}
+    for name, label, n in sorted(snap["counts"]):
+        counts.setdefault(name, {})[label] = n
+    if stages or counts:
+        print("\n---- timing summary ----")
+        for stage, s in stages.items():
+            print(f"{stage:<28} n={s['n']:<6} total {s['total_ms']:>10.1f} ms | p50 {s['p50_ms']:>9.3f}"
+                  f" | p90 {s['p90_ms']:>9.3f} | p99 {s['p99_ms']:>9.3f} | max {s['max_ms']:>9.3f}")
+        for name, labels in counts.items():
+            print(f"{name:<28} " + ", ".join(f"{k or '-'}={v}" for k, v in labels.items()))
+    if log:
+        event("summary", stages=stages, counts=counts)
+    return {"stages": stages, "counts": counts}
@@ -0,0 +1,242 @@
+# src/pipeline.py
+# Three-stage scrape: fetch threads -> parser processes -> one writer.
+#
+# Fetching is network-bound and happy in threads; BeautifulSoup parsing and
+# extract_player are CPU-bound and hold the GIL, so they run in a process
+# pool. Stages are joined by bounded queues: when the parsers fall behind,
+# the fetchers block on a full queue instead of piling pages up in memory.
+#
+# With FETCH_BACKEND = "http2" the fetch stage is a single asyncio loop
+# (async_fetch.py) instead of a pool of threads.
+#
+# usage:
+#   python src/pipeline.py urls.txt --fetchers 8 --parsers 4
+#   python src/batch.py urls.txt --parsers 4        # same thing
+import os
+import time
+import queue
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import main
+import metrics
+import session
+import batch
+
+# ---------------- CONFIG ----------------
+DEFAULT_FETCHERS = batch.DEFAULT_WORKERS
+DEFAULT_PARSERS = os.cpu_count() or 2
+QUEUE_SIZE = 32             # fetched pages waiting for a parser
+# ----------------------------------------
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.errors = 0
+        self.busy = 0.0     # summed seconds spent in the stage's work
+        self._lock = threading.Lock()
+
+    def record(self, seconds, ok=True):
+        with self._lock:
+            if ok:
+                self.count += 1
+            else:
+                self.errors += 1
+            self.busy += seconds
+
+    def summary(self, wall):
+        rate = self.count / wall if wall > 0 else 0.0
+        avg = self.busy / max(1, self.count + self.errors)
+        return (f"{self.name:>6}: {self.count} ok, {self.errors} failed, "
+                f"{rate:.2f}/s, avg {avg * 1000:.0f} ms")
+
+def parse_worker(url, html):
+    # runs in a worker process; its timings go back with the result and are
+    # merged into the parent's metrics
+    t0 = time.perf_counter()
+    info = main.parse_page(html, url)
+    stats_tables = main.parse_stats_tables(html)
+    return info, stats_tables, time.perf_counter() - t0, metrics.snapshot(reset=True)
+
+def run_pipeline(urls, fetchers=DEFAULT_FETCHERS, parsers=DEFAULT_PARSERS, queue_size=QUEUE_SIZE,
+                 per_host=batch.DEFAULT_PER_HOST):
+    main.SAVE_DEBUG_HTML = False
+    limiter = batch.HostLimiter(per_host=per_host)
+    stats = {name: StageStats(name) for name in ("fetch", "parse", "write")}
+    failed = []
+    failed_lock = threading.Lock()
+    stop = threading.Event()
+    out = main.open_sink()
+    table_writer = None
+    if main.EXTRACT_STATS_TABLES:
+        import tables
+        table_writer = tables.TableWriter(main.STATS_DIR)
+
+    todo = queue.Queue()
+    for u in urls:
+        todo.put(u)
+    pages = queue.Queue(maxsize=queue_size)     # (url, html), None = fetchers done
+    results = queue.Queue()                     # (url, future), None = parsers done
+
+    def fail(url, stage, e):
+        print(f"[pipeline] {stage} failed: {url} - {e}")
+        with failed_lock:
+            failed.append(url)
+
+    def put_until_stopped(q, item):
+        # blocks while the queue is full (backpressure) but notices shutdown
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def fetch_loop():
+        while not stop.is_set():
+            try:
+                url = todo.get_nowait()
+            except queue.Empty:
+                return
+            t0 = time.perf_counter()
+            try:
+                html = main.fetch_html(url, headless=True, limiter=limiter)
+            except Exception as e:
+                stats["fetch"].record(time.perf_counter() - t0, ok=False)
+                fail(url, "fetch", e)
+                continue
+            stats["fetch"].record(time.perf_counter() - t0)
+            # bytes pickle as-is; a cache hit's mmap can't be sent to a worker
+            if not put_until_stopped(pages, (url, main.as_markup(html))):
+                return
+
+    def write_loop():
+        while True:
+            item = results.get()
+            if item is None:
+                return
+            url, fut = item
+            try:
+                info, stats_tables, _, _ = fut.result()
+            except Exception as e:
+                stats["parse"].record(0.0, ok=False)
+                fail(url, "parse", e)
+                continue
+            t0 = time.perf_counter()
+            try:
+                out.write(info)
+                main.save_stats_tables(url, stats_tables, table_writer)
+            except Exception as e:
+                stats["write"].record(time.perf_counter() - t0, ok=False)
+                fail(url, "write", e)
+                continue
+            stats["write"].record(time.perf_counter() - t0)
+
+    def fetch_async():
+        # FETCH_BACKEND = "http2": one event loop instead of `fetchers` threads
+        # (ratelimit.py paces the hosts; per_host doesn't apply)
+        import async_fetch
+
+        def on_page(url, html, secs):
+            stats["fetch"].record(secs)
+            put_until_stopped(pages, (url, main.as_markup(html)))
+
+        def on_error(url, e):
+            stats["fetch"].record(0.0, ok=False)
+            fail(url, "fetch", e)
+
+        async_fetch.fetch_all(urls, on_page, on_error, headless=True, stop=stop)
+
+    if main.FETCH_BACKEND == "http2":
+        fetch_threads = [threading.Thread(target=fetch_async, name="fetch-async", daemon=True)]
+    else:
+        fetch_threads = [threading.Thread(target=fetch_loop, name=f"fetch-{i}", daemon=True)
+                         for i in range(fetchers)]
+    writer = threading.Thread(target=write_loop, name="writer", daemon=True)
+
+    def close_pages():
+        for t in fetch_threads:
+            t.join()
+        pages.put(None)
+
+    t_start = time.monotonic()
+    for t in fetch_threads:
+        t.start()
+    threading.Thread(target=close_pages, name="fetch-closer", daemon=True).start()
+    writer.start()
+
+    # at most two pages per parser are in flight; the rest wait in `pages`
+    in_flight = threading.BoundedSemaphore(parsers * 2)
+
+    def parsed(fut, url):
+        in_flight.release()
+        if not fut.cancelled() and not fut.exception():
+            _, _, secs, snap = fut.result()
+            stats["parse"].record(secs)
+            metrics.merge(snap)
+        results.put((url, fut))
+
+    # workers come from a forkserver (spawn where there is none), not a fork
+    # of this process: the fetch threads are already running and may hold
+    # metrics._lock or another lock a forked child would inherit held.
+    # metrics.reset makes sure only the worker's own timings come back.
+    # (Scripts that call run_pipeline need an `if __name__ == "__main__":`
+    # guard, as with any non-fork pool.)
+    methods = multiprocessing.get_all_start_methods()
+    ctx = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+    pool = ProcessPoolExecutor(max_workers=parsers, mp_context=ctx, initializer=metrics.reset)
+    try:
+        while True:
+            item = pages.get()
+            if item is None:
+                break
+            url, html = item
+            in_flight.acquire()
+            fut = pool.submit(parse_worker, url, html)
+            fut.add_done_callback(lambda f, url=url: parsed(f, url))
+        pool.shutdown(wait=True)
+    except KeyboardInterrupt:
+        print("[pipeline] interrupted, shutting down...")
+        stop.set()
+        pool.shutdown(wait=True, cancel_futures=True)
+    finally:
+        results.put(None)
+        writer.join()
+        out.close()
+        session.save_cookies()
+
+    wall = time.monotonic() - t_start
+    print(f"[pipeline] done in {wall:.1f}s")
+    for s in stats.values():
+        print("  " + s.summary(wall))
+    metrics.summary()
+    return stats, failed
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Scrape player URLs with separate fetch/parse/write stages.")
+    ap.add_argument("urls", help="file with one player URL per line, or - for stdin")
+    ap.add_argument("--fetchers", type=int, default=DEFAULT_FETCHERS)
+    ap.add_argument("--parsers", type=int, default=DEFAULT_PARSERS)
+    ap.add_argument("--queue-size", type=int, default=QUEUE_SIZE)
+    ap.add_argument("--per-host", type=int, default=batch.DEFAULT_PER_HOST)
+    return ap.parse_args(argv)
+
+def cli(argv=None):
+    args = parse_args(argv)
+    urls = batch.read_urls(args.urls)
+    if not urls:
+        raise SystemExit("no URLs given")
+    main.ensure_data_dir()
+    _, failed = run_pipeline(urls, fetchers=args.fetchers, parsers=args.parsers,
+                             queue_size=args.queue_size, per_host=args.per_host)
+    if failed:
+        print("Failed URLs:")
+        for u in failed:
+            print(" ", u)
+
+if __name__ == "__main__":
+    cli()
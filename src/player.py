@@ -0,0 +1,128 @@
+# src/player.py
+# Typed player records for use as a library.
+#
+#   from player import scrape_player, parse_player, load_players
+#   p = scrape_player("https://fbref.com/en/players/b66315ae/Gabriel-Jesus")
+#   p.height_cm, p.dob, p.age          # 177, date(1997, 4, 3), 29
+#   heights = [p.height_cm for p in load_players() if p.position == "FW"]
+#
+# extract_player / parse_page still produce the dict of strings the CSV is
+# written from ("177 cm", "Not Found", ...). Player is that row converted once:
+# numbers as int, dates as datetime.date, missing values as None. It is a
+# namedtuple, so a record costs ~150 bytes instead of a dict plus eleven
+# strings, and the few distinct nationality/position/foot values are interned.
+# Age is not stored; it is worked out from dob when asked for.
+import re
+import csv
+import sys
+from collections import namedtuple
+from datetime import date
+
+from dates import try_parse_date
+
+MISSING = "Not Found"
+CM_RE = re.compile(r'(\d{2,3})\s?cm', re.I)
+M_RE = re.compile(r'(\d\.\d+)\s?m\b', re.I)
+KG_RE = re.compile(r'(\d{2,3})\s?kg', re.I)
+
+def _text(v, intern=False):
+    if v is None or v == MISSING or not v.strip():
+        return None
+    return sys.intern(v) if intern else v
+
+def height_cm(s):
+    # "177 cm" -> 177, "1.77 m" -> 177, else None
+    if not s:
+        return None
+    m = CM_RE.search(s)
+    if m:
+        return int(m.group(1))
+    m = M_RE.search(s)
+    return round(float(m.group(1)) * 100) if m else None
+
+def weight_kg(s):
+    m = KG_RE.search(s) if s else None
+    return int(m.group(1)) if m else None
+
+def _date(s):
+    s = _text(s)
+    return try_parse_date(s) if s else None
+
+def age_on(dob, day):
+    return day.year - dob.year - ((day.month, day.day) < (dob.month, dob.day))
+
+_Player = namedtuple("_Player", "name dob height_cm weight_kg nationality position preferred_foot "
+                                "birthplace debut contract_until source_url")
+
+class Player(_Player):
+    __slots__ = ()
+
+    @classmethod
+    def from_row(cls, row):
+        # row: what extract_player / parse_page return, or a CSV row from sink.py
+        return cls(
+            name=_text(row.get("name")),
+            dob=_date(row.get("dob")),
+            height_cm=height_cm(_text(row.get("height"))),
+            weight_kg=weight_kg(_text(row.get("weight"))),
+            nationality=_text(row.get("nationality"), intern=True),
+            position=_text(row.get("position"), intern=True),
+            preferred_foot=_text(row.get("preferred_foot"), intern=True),
+            birthplace=_text(row.get("birthplace")),
+            debut=_date(row.get("debut")),
+            contract_until=_date(row.get("contract_until")),
+            source_url=_text(row.get("source_url")),
+        )
+
+    @property
+    def age(self):
+        return age_on(self.dob, date.today()) if self.dob else None
+
+    @property
+    def player_id(self):
+        import main
+        return main.player_id_from_url(self.source_url) or None
+
+    def to_row(self):
+        # back to the CSV layout (sink.HEADER)
+        def s(v, fmt="{}"):
+            return MISSING if v is None else fmt.format(v)
+        return {
+            "name": s(self.name),
+            "dob": s(self.dob and self.dob.isoformat()),
+            "age": s(self.age),
+            "height": s(self.height_cm, "{} cm"),
+            "weight": s(self.weight_kg, "{} kg"),
+            "nationality": s(self.nationality),
+            "position": s(self.position),
+            "preferred_foot": s(self.preferred_foot),
+            "birthplace": s(self.birthplace),
+            "debut": s(self.debut and self.debut.isoformat()),
+            "contract_until": s(self.contract_until and self.contract_until.isoformat()),
+            "source_url": s(self.source_url),
+        }
+
+def parse_player(html, url=""):
+    # html: str, UTF-8 bytes or an mmap of them (see main.parse_page)
+    import main
+    return Player.from_row(main.parse_page(html, url))
+
+def scrape_player(url, headless=True):
+    # fetch (cache, cloudscraper, browser fallback) + parse; nothing is written
+    import main
+    return parse_player(main.fetch_html(url, headless=headless), url)
+
+def load_players(path=None):
+    # stream Players out of the output (main.OUTPUT_FORMAT), or out of the
+    # given .db / .csv file
+    import main
+    path = path or main.output_path()
+    if path.endswith(".db"):
+        import store
+        with store.PlayerStore(path) as db:
+            for rec in db.iter_rows(order="rowid"):
+                yield Player.from_row(dict(zip(store.HEADER, rec)))
+        return
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield Player.from_row(row)
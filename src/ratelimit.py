@@ -0,0 +1,143 @@
+# src/ratelimit.py
+# Shared, adaptive per-host rate limiting for the fetch layer.
+#
+# Every request to a host takes a token from that host's bucket. The refill
+# rate adapts AIMD-style: each 200 nudges it up a little, each 403/429 halves
+# it. A Retry-After header pauses the host for that long. After
+# BREAKER_THRESHOLD blocked responses in a row the host's circuit opens:
+# fetch_html_cloudscraper then fails fast (so fetch_html goes straight to
+# the browser fallback) until BREAKER_COOLDOWN has passed, after which one
+# probe request is let through to decide whether to close it again.
+#
+# Only news counts against a host: every success and every counted block
+# starts a new generation, and a response to a request sent in an earlier
+# generation (still in flight when the first 403 came back, say) neither
+# halves the rate nor moves the breaker. Otherwise a cold concurrent start
+# against a cookie wall opens the circuit before the root visit can help.
+import time
+import threading
+
+# ---------------- CONFIG ----------------
+START_RATE = 1.0            # requests per second per host
+MIN_RATE = 0.05
+MAX_RATE = 4.0
+BURST = 2                   # tokens a host can bank
+INCREASE = 0.05             # added to the rate after a success
+DECREASE = 0.5              # rate multiplier after a 403/429
+ERROR_DECREASE = 0.8        # rate multiplier after a 5xx / network error
+BLOCK_STATUSES = (403, 429)
+BREAKER_THRESHOLD = 3       # blocked responses in a row before the circuit opens
+BREAKER_COOLDOWN = 300      # seconds the circuit stays open
+MAX_RETRY_AFTER = 600       # ignore absurd Retry-After values
+# ----------------------------------------
+
+class CircuitOpen(RuntimeError):
+    pass
+
+def parse_retry_after(value):
+    # seconds ("120") or an HTTP date; None if missing/unparseable
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return min(float(value), MAX_RETRY_AFTER)
+    from email.utils import parsedate_to_datetime
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, min(when.timestamp() - time.time(), MAX_RETRY_AFTER))
+
+class HostLimiter:
+    def __init__(self, host):
+        self.host = host
+        self.rate = START_RATE
+        self.tokens = float(BURST)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.blocked_in_a_row = 0
+        self.open_until = 0.0
+        self.probing = False
+        self.generation = 0         # see record()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(BURST, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def state(self):
+        with self._lock:
+            now = time.monotonic()
+            if now < self.open_until:
+                return "open"
+            return "half-open" if self.blocked_in_a_row >= BREAKER_THRESHOLD else "closed"
+
+    def reserve(self):
+        # non-blocking acquire(): 0 if a request may go out now, else the
+        # seconds to wait before asking again (the async backend awaits this)
+        with self._lock:
+            now = time.monotonic()
+            if now < self.open_until:
+                raise CircuitOpen(f"{self.host}: circuit open for another {self.open_until - now:.0f}s")
+            if self.blocked_in_a_row >= BREAKER_THRESHOLD:
+                # half-open: one probe at a time
+                if self.probing:
+                    raise CircuitOpen(f"{self.host}: circuit half-open, probe in flight")
+                self.probing = True
+            self._refill(now)
+            wait = self.paused_until - now
+            if wait <= 0 and self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            if wait <= 0:
+                wait = (1 - self.tokens) / self.rate
+            if self.probing:
+                self.probing = False
+            return wait
+
+    def acquire(self):
+        # blocks until a request may go out; raises CircuitOpen instead of
+        # waiting out an open circuit
+        while True:
+            wait = self.reserve()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def record(self, status, retry_after=None, generation=None):
+        # generation: self.generation when the request went out (None: count it)
+        with self._lock:
+            self.probing = False
+            if status is not None and 200 <= status < 400:
+                self.rate = min(MAX_RATE, self.rate + INCREASE)
+                self.blocked_in_a_row = 0
+                self.generation += 1
+                return
+            stale = generation is not None and generation != self.generation
+            if status in BLOCK_STATUSES and not stale:
+                self.generation += 1
+                self.rate = max(MIN_RATE, self.rate * DECREASE)
+                self.blocked_in_a_row += 1
+                if self.blocked_in_a_row >= BREAKER_THRESHOLD:
+                    self.open_until = time.monotonic() + BREAKER_COOLDOWN
+                    print(f"[ratelimit] {self.host}: {self.blocked_in_a_row} blocks in a row, "
+                          f"pausing for {BREAKER_COOLDOWN}s")
+            elif status not in BLOCK_STATUSES:
+                self.rate = max(MIN_RATE, self.rate * ERROR_DECREASE)
+            delay = parse_retry_after(retry_after)
+            if delay:
+                self.paused_until = max(self.paused_until, time.monotonic() + delay)
+                print(f"[ratelimit] {self.host}: Retry-After {delay:.0f}s")
+
+_hosts = {}
+_hosts_lock = threading.Lock()
+
+def for_host(host):
+    with _hosts_lock:
+        if host not in _hosts:
+            _hosts[host] = HostLimiter(host)
+        return _hosts[host]
+
+def reset():
+    with _hosts_lock:
+        _hosts.clear()
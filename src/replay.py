@@ -0,0 +1,429 @@
+# src/replay.py
+# Offline fetch harness: a local stub of the site that replays saved pages.
+#
+# ReplayServer serves every /en/players/<id>/<name> URL from a corpus of saved
+# pages (src/page.html by default; same corpus layout as bench.py --corpus)
+# and misbehaves on request: added latency, bare 403s, 429s with Retry-After,
+# 500s, URLs that only ever get a Cloudflare-style challenge page, and a
+# cookie wall that 403s player pages until the client has visited "/". The
+# harness points the real fetch + parse path (fetch_html_cloudscraper or
+# async_fetch, ratelimit, the page cache, the Selenium fallback) at it, with a
+# stand-in browser pool that "solves" challenges by serving the same page
+# after --browser-ms, and reports throughput, HTTP attempts and retries, root
+# visits, fallback rate and any row that differs from parsing the page
+# directly. Nothing touches the network, data/ or the event log.
+#
+# usage:
+#   python src/replay.py                                  # 200 clean pages
+#   python src/replay.py -n 500 --concurrency 32 --latency 80 --jitter 40
+#   python src/replay.py --p403 0.05 --p429 0.02 --challenge 0.1 --need-cookie
+#   python src/replay.py --backend http2 --corpus pages/
+#   python src/replay.py --serve --p429 0.1        # just run the stub
+#   python src/replay.py --check [--backend http2]  # regression scenarios (CHECKS)
+import os
+import sys
+import time
+import zlib
+import random
+import argparse
+import tempfile
+import threading
+import contextlib
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import main
+import bench
+import cache
+import session
+import metrics
+import ratelimit
+import browser_pool
+
+# ---------------- CONFIG ----------------
+LATENCY_MS = 50             # added to every response
+JITTER_MS = 0               # + uniform 0..JITTER_MS
+RETRY_AFTER = 1             # seconds, sent with every 429
+BROWSER_MS = 500            # time the stand-in browser takes per page
+COOKIE = "cf_clearance"     # set by "/", required by --need-cookie
+CONCURRENCY = 16
+PAGES = 200
+RATE = 1000.0               # per-host requests/s for ratelimit (the stub is one host)
+# ----------------------------------------
+
+CHALLENGE_PAGE = (b"<!DOCTYPE html><html><head><title>Just a moment...</title></head>"
+                  b"<body><div id=\"challenge-running\">Checking your browser before accessing"
+                  b" the site.</div><noscript>Enable JavaScript and cookies to continue</noscript>"
+                  b"</body></html>")
+
+class ReplayServer:
+    def __init__(self, pages, latency_ms=LATENCY_MS, jitter_ms=JITTER_MS, p403=0.0, p429=0.0,
+                 p500=0.0, challenge=0.0, need_cookie=False, retry_after=RETRY_AFTER, seed=0):
+        # pages: [(name, html bytes)]; the p* are per-request chances,
+        # challenge the share of URLs that never get past the challenge page
+        self.pages = pages
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.p403 = p403
+        self.p429 = p429
+        self.p500 = p500
+        self.challenge = challenge
+        self.need_cookie = need_cookie
+        self.retry_after = retry_after
+        self.seed = seed
+        self.etags = [f'"{zlib.crc32(html):08x}"' for _, html in pages]
+        self.base = None
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {"requests": 0, "root": 0, "inflight": 0, "max_inflight": 0, "status": {}}
+
+    def page_index(self, path):
+        # which saved page a player URL replays (stable for a path)
+        return zlib.crc32(path.encode()) % len(self.pages)
+
+    def page_for(self, path):
+        return self.pages[self.page_index(path)]
+
+    def challenged(self, path):
+        return zlib.crc32(f"{self.seed}:{path}".encode()) / 2**32 < self.challenge
+
+    def url(self, i, name):
+        return f"{self.base}/en/players/{i:08x}/{os.path.splitext(name)[0]}"
+
+    def _roll(self):
+        with self._lock:
+            return self._rng.random()
+
+    def respond(self, path, headers):
+        # (status, response headers, body) for a GET
+        if path == "/":
+            with self._lock:
+                self.stats["root"] += 1
+            return 200, {"Set-Cookie": f"{COOKIE}=ok; Path=/"}, b"ok"
+        if not path.startswith("/en/players/"):
+            return 404, {}, b""
+        if self.challenged(path):
+            return 403, {"cf-mitigated": "challenge", "Content-Type": "text/html"}, CHALLENGE_PAGE
+        if self.need_cookie and f"{COOKIE}=" not in (headers.get("Cookie") or ""):
+            return 403, {}, b""
+        roll = self._roll()
+        if roll < self.p403:
+            return 403, {}, b""
+        roll -= self.p403
+        if roll < self.p429:
+            return 429, {"Retry-After": str(self.retry_after)}, b""
+        roll -= self.p429
+        if roll < self.p500:
+            return 500, {}, b""
+        i = self.page_index(path)
+        if headers.get("If-None-Match") == self.etags[i]:
+            return 304, {"ETag": self.etags[i]}, b""
+        return 200, {"Content-Type": "text/html; charset=utf-8", "ETag": self.etags[i]}, self.pages[i][1]
+
+    def handle(self, req):
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["inflight"] += 1
+            self.stats["max_inflight"] = max(self.stats["max_inflight"], self.stats["inflight"])
+        try:
+            delay = self.latency_ms + (self._roll() * self.jitter_ms if self.jitter_ms else 0)
+            if delay > 0:
+                time.sleep(delay / 1000)
+            status, headers, body = self.respond(req.path, req.headers)
+            with self._lock:
+                self.stats["status"][status] = self.stats["status"].get(status, 0) + 1
+            req.send_response(status)
+            for k, v in headers.items():
+                req.send_header(k, v)
+            req.send_header("Content-Length", str(len(body)))
+            req.end_headers()
+            req.wfile.write(body)
+        finally:
+            with self._lock:
+                self.stats["inflight"] -= 1
+
+    def start(self, port=0):
+        replay = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"       # keep-alive, like the real site
+
+            def do_GET(self):
+                replay.handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, name="replay-server", daemon=True).start()
+        self.base = f"http://127.0.0.1:{self._httpd.server_port}"
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+# stands in for Chrome: after browser_ms, gets past any challenge, or with
+# solves=False is stuck on it like the HTTP backends
+class ReplayBrowserPool:
+    def __init__(self, server, browser_ms=BROWSER_MS, solves=True):
+        self.server = server
+        self.browser_ms = browser_ms
+        self.solves = solves
+        self.requested = []
+
+    def fetch(self, url, timeout=browser_pool.READY_TIMEOUT, ready=None):
+        self.requested.append(url)
+        path = urlparse(url).path
+        with metrics.timer("selenium_fetch"):
+            time.sleep(self.browser_ms / 1000)
+            if not self.solves and self.server.challenged(path):
+                return CHALLENGE_PAGE.decode("utf-8")
+            return self.server.page_for(path)[1].decode("utf-8")
+
+    def close(self):
+        pass
+
+@contextlib.contextmanager
+def isolated(server, backend, rate=RATE, cooldown=None, browser_ms=BROWSER_MS, browser_solves=True):
+    # fresh cache, cookie jar, rate limiters and metrics in a temp dir;
+    # module settings are put back afterwards
+    saved = (main.FETCH_BACKEND, main.SAVE_DEBUG_HTML, main.USE_PAGE_CACHE, cache._cache,
+             session.COOKIE_JAR, metrics.LOG_EVENTS, ratelimit.START_RATE, ratelimit.MAX_RATE,
+             ratelimit.BURST, ratelimit.BREAKER_COOLDOWN)
+    with tempfile.TemporaryDirectory(prefix="replay-") as tmp:
+        main.FETCH_BACKEND = backend
+        main.SAVE_DEBUG_HTML = False
+        main.USE_PAGE_CACHE = True
+        cache._cache = cache.PageCache(os.path.join(tmp, "cache"))
+        session.COOKIE_JAR = os.path.join(tmp, "cookies.txt")
+        session.reset()
+        metrics.LOG_EVENTS = False
+        metrics.reset()
+        ratelimit.START_RATE = ratelimit.MAX_RATE = rate
+        ratelimit.BURST = max(ratelimit.BURST, int(rate))
+        if cooldown is not None:
+            ratelimit.BREAKER_COOLDOWN = cooldown
+        ratelimit.reset()
+        prev_pool = browser_pool.set_browser_pool(ReplayBrowserPool(server, browser_ms, browser_solves))
+        try:
+            yield
+        finally:
+            if backend == "http2":
+                import async_fetch
+                async_fetch.close()
+            browser_pool.set_browser_pool(prev_pool)
+            cache._cache.close()
+            session.reset()
+            ratelimit.reset()
+            (main.FETCH_BACKEND, main.SAVE_DEBUG_HTML, main.USE_PAGE_CACHE, cache._cache,
+             session.COOKIE_JAR, metrics.LOG_EVENTS, ratelimit.START_RATE, ratelimit.MAX_RATE,
+             ratelimit.BURST, ratelimit.BREAKER_COOLDOWN) = saved
+
+def expected_rows(pages):
+    # what parse_page makes of each saved page without any fetching
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        return [main.parse_page(html, "") for _, html in pages]
+
+def drive(urls, backend, concurrency, on_row, on_error):
+    # the batch.py paths, minus the sink
+    if backend == "http2":
+        import async_fetch
+        async_fetch.fetch_all(urls, lambda url, html, secs: on_row(url, main.parse_page(html, url)),
+                              on_error, headless=True, concurrency=concurrency)
+        return
+
+    def one(url):
+        try:
+            html = main.fetch_html(url, headless=True)
+            on_row(url, main.parse_page(html, url))
+        except Exception as e:
+            on_error(url, e)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, urls))
+
+def run(server, n=PAGES, backend=None, concurrency=CONCURRENCY, rate=RATE, cooldown=None,
+        browser_ms=BROWSER_MS, browser_solves=True, verbose=False):
+    backend = backend or main.FETCH_BACKEND
+    urls = [server.url(i, server.pages[i % len(server.pages)][0]) for i in range(n)]
+    lock = threading.Lock()
+    ok, empty, failed, bad = [0], [0], [], {}
+
+    def on_row(url, row):
+        diffs = bench.diff_row(want[server.page_index(urlparse(url).path)], row)
+        with lock:
+            ok[0] += 1
+            empty[0] += row.get("name", "Not Found") == "Not Found"
+            if diffs:
+                bad[url] = diffs
+
+    def on_error(url, e):
+        with lock:
+            failed.append((url, repr(e)))
+
+    server.reset_stats()
+    with isolated(server, backend, rate, cooldown, browser_ms, browser_solves):
+        want = expected_rows(server.pages)
+        metrics.reset()
+        out = sys.stdout if verbose else open(os.devnull, "w")
+        try:
+            with contextlib.redirect_stdout(out):
+                t0 = time.perf_counter()
+                drive(urls, backend, concurrency, on_row, on_error)
+                wall = time.perf_counter() - t0
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        snap = metrics.snapshot()
+        # challenge pages must never end up in the cache
+        page_cache = cache.get_page_cache()
+        cached_challenges = sum(1 for u in urls if server.challenged(urlparse(u).path)
+                                and page_cache.get(u) is not None)
+
+    hists = snap["hists"]
+    counts = {}
+    for name, label, v in snap["counts"]:
+        counts.setdefault(name, {})[label] = v
+    attempts = hists.get("fetch_attempt", {}).get("n", 0)
+    backends = counts.get("fetch_backend", {})
+    fetch = hists.get("fetch_page")
+    return {
+        "backend": backend,
+        "pages": n,
+        "concurrency": concurrency,
+        "wall_s": wall,
+        "pages_per_s": ok[0] / wall if wall else 0.0,
+        "ok": ok[0],
+        "empty": empty[0],
+        "cached_challenges": cached_challenges,
+        "failed": failed,
+        "bad": bad,
+        "attempts": attempts,
+        "retries": max(0, attempts - n),     # attempts beyond the first per page
+        "root_visits": hists.get("root_warmup", {}).get("n", 0),
+        "fallbacks": backends.get("selenium", 0),
+        "http_status": counts.get("http_status", {}),
+        "fetch_p50_ms": metrics.percentile(fetch, 0.5) if fetch else None,
+        "fetch_p99_ms": metrics.percentile(fetch, 0.99) if fetch else None,
+        "server": dict(server.stats),
+    }
+
+def print_run(res):
+    n = res["pages"]
+    print(f"{n} pages via {res['backend']}, concurrency {res['concurrency']}:"
+          f" {res['wall_s']:.2f}s, {res['pages_per_s']:.1f} pages/s")
+    if res["fetch_p50_ms"] is not None:
+        print(f"  fetch p50 {res['fetch_p50_ms']:.1f} ms | p99 {res['fetch_p99_ms']:.1f} ms")
+    print(f"  HTTP attempts {res['attempts']} ({res['attempts'] / n:.2f}/page), retries {res['retries']},"
+          f" root visits {res['root_visits']}")
+    print(f"  browser fallback {res['fallbacks']}/{n} ({100 * res['fallbacks'] / n:.1f}%),"
+          f" failed {len(res['failed'])}")
+    print("  http_status " + ", ".join(f"{k}={v}" for k, v in sorted(res["http_status"].items())))
+    srv = res["server"]
+    print(f"  server: {srv['requests']} requests, max {srv['max_inflight']} in flight, "
+          + ", ".join(f"{k}={v}" for k, v in sorted(srv["status"].items())))
+    print(f"  rows: {res['ok'] - len(res['bad'])} match, {len(res['bad'])} differ, {res['empty']} empty;"
+          f" challenge pages cached: {res['cached_challenges']}")
+    for url, diffs in list(res["bad"].items())[:5]:
+        for k, want, got in diffs:
+            print(f"    {url}: {k}: expected {want!r}, got {got!r}")
+    for url, err in res["failed"][:5]:
+        print(f"    failed {url}: {err}")
+
+# (name, ReplayServer options, run() options, test on the report); rows that
+# differ from the saved pages' fail every check
+CHECKS = (
+    # 16 requests in flight all get the cookie wall's 403 before the first root
+    # visit; that must not open the circuit (ratelimit generations)
+    ("cold concurrent start behind a cookie wall",
+     dict(need_cookie=True, latency_ms=5), dict(n=60, concurrency=16, browser_ms=20),
+     lambda res: res["fallbacks"] == 0 and res["root_visits"] > 0 and not res["failed"]),
+    # the browser can't get past the challenge either: those URLs must fail,
+    # not come back (or get cached) as the challenge page's empty row
+    ("challenge the browser can't solve",
+     dict(challenge=0.25, latency_ms=5), dict(n=40, browser_ms=5, browser_solves=False),
+     lambda res: res["failed"] and res["empty"] == 0 and res["cached_challenges"] == 0
+                 and res["ok"] + len(res["failed"]) == res["pages"]),
+)
+
+def run_checks(pages, backend=None, verbose=False):
+    failed = 0
+    for name, server_opts, run_opts, test in CHECKS:
+        with ReplayServer(pages, **server_opts) as server:
+            res = run(server, backend=backend, verbose=verbose, **run_opts)
+        ok = bool(test(res)) and not res["bad"]
+        failed += not ok
+        print(f"[{'ok' if ok else 'FAIL'}] {name}")
+        print_run(res)
+    return failed
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Replay saved pages from a local stub server through the fetch path.")
+    ap.add_argument("--corpus", default=main.DEBUG_HTML, metavar="DIR",
+                    help="saved page(s) to serve: a directory of *.html or one file")
+    ap.add_argument("-n", type=int, default=PAGES, help="player URLs to fetch")
+    ap.add_argument("--backend", choices=("cloudscraper", "http2"), default=None,
+                    help="default: main.FETCH_BACKEND")
+    ap.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    ap.add_argument("--latency", type=float, default=LATENCY_MS, metavar="MS")
+    ap.add_argument("--jitter", type=float, default=JITTER_MS, metavar="MS")
+    ap.add_argument("--p403", type=float, default=0.0, help="chance of a bare 403 per request")
+    ap.add_argument("--p429", type=float, default=0.0, help="chance of a 429 per request")
+    ap.add_argument("--p500", type=float, default=0.0, help="chance of a 500 per request")
+    ap.add_argument("--retry-after", type=int, default=RETRY_AFTER, metavar="S")
+    ap.add_argument("--challenge", type=float, default=0.0,
+                    help="share of URLs that only ever get a challenge page")
+    ap.add_argument("--need-cookie", action="store_true", help="403 player pages until / was visited")
+    ap.add_argument("--browser-ms", type=float, default=BROWSER_MS, help="stand-in browser time per page")
+    ap.add_argument("--rate", type=float, default=RATE, help="ratelimit requests/s for the stub host")
+    ap.add_argument("--cooldown", type=float, default=None,
+                    help="circuit breaker cooldown in seconds (default ratelimit.BREAKER_COOLDOWN)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--check", action="store_true", help="run the CHECKS scenarios; exit 1 if one fails")
+    ap.add_argument("--serve", action="store_true", help="only run the stub server until Ctrl-C")
+    ap.add_argument("--port", type=int, default=0, help="server port (default: any free one)")
+    ap.add_argument("-v", "--verbose", action="store_true", help="show the fetch log")
+    return ap.parse_args(argv)
+
+def cli(argv=None):
+    args = parse_args(argv)
+    pages, _, _ = bench.load_corpus(args.corpus)
+    if args.check:
+        return 1 if run_checks(pages, args.backend, args.verbose) else 0
+    server = ReplayServer(pages, latency_ms=args.latency, jitter_ms=args.jitter, p403=args.p403,
+                          p429=args.p429, p500=args.p500, challenge=args.challenge,
+                          need_cookie=args.need_cookie, retry_after=args.retry_after, seed=args.seed)
+    server.start(args.port)
+    try:
+        if args.serve:
+            print(f"replaying {len(pages)} saved pages at {server.url(0, pages[0][0])} (Ctrl-C to stop)")
+            try:
+                while True:
+                    time.sleep(3600)
+            except KeyboardInterrupt:
+                return 0
+        res = run(server, args.n, args.backend, args.concurrency, args.rate, args.cooldown,
+                  args.browser_ms, args.verbose)
+    finally:
+        server.stop()
+    print_run(res)
+    return 1 if res["bad"] or res["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(cli())
@@ -0,0 +1,193 @@
+# src/scheduler.py
+# Incremental re-scrape: only refresh what is due, only re-extract what changed.
+#
+# Per player we keep the last fetch time, a hash of the #meta block and the
+# last extracted row (data/scrape_state.db). Each run picks the players that
+# are due: never fetched, or older than --stale-days; players whose contract
+# runs out within --contract-days are refreshed more often. A fetched page
+# whose #meta hash is unchanged is not parsed at all.
+#
+# usage:
+#   python src/scheduler.py --add urls.txt          # register players
+#   python src/scheduler.py --limit 500             # refresh what is due
+#   python src/scheduler.py --dry-run               # just list what is due
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import main
+import batch
+import metrics
+import session
+
+# ---------------- CONFIG ----------------
+STATE_DB = os.path.join(main.DATA_DIR, "scrape_state.db")
+STALE_DAYS = 7              # refresh everyone at least this often
+CONTRACT_DAYS = 180         # contracts ending within this window ...
+CONTRACT_STALE_DAYS = 1     # ... are refreshed this often instead
+# ----------------------------------------
+
+def meta_hash(html):
+    # html: str, UTF-8 bytes or an mmap of them (same digest for all three)
+    bounds = main.meta_bounds(html)
+    if bounds:
+        block = html[bounds[0]:bounds[1]]
+    else:
+        # #meta inside a comment: hash that comment from id="meta" on
+        start = html.find(main.literal(html, 'id="meta"'))
+        if start < 0:
+            return None
+        end = html.find(main.literal(html, "-->"), start)
+        block = html[start:end if end >= 0 else len(html)]
+    if isinstance(block, str):
+        block = block.encode("utf-8")
+    return hashlib.sha256(block).hexdigest()
+
+class ScrapeState:
+    def __init__(self, path=STATE_DB):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS players ("
+            " url TEXT PRIMARY KEY, last_fetch REAL, meta_hash TEXT,"
+            " row TEXT, contract_until TEXT, priority INTEGER DEFAULT 0)"
+        )
+        self._db.commit()
+
+    def add(self, urls, priority=0):
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO players (url, priority) VALUES (?, ?)",
+                [(u, priority) for u in urls],
+            )
+            self._db.commit()
+
+    def get(self, url):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT last_fetch, meta_hash, row FROM players WHERE url = ?", (url,)
+            ).fetchone()
+        if not row:
+            return None
+        return {"last_fetch": row[0], "meta_hash": row[1], "row": json.loads(row[2]) if row[2] else None}
+
+    def touch(self, url):
+        # fetched, #meta unchanged
+        with self._lock:
+            self._db.execute("UPDATE players SET last_fetch = ? WHERE url = ?", (time.time(), url))
+            self._db.commit()
+
+    def update(self, url, digest, info):
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO players (url, last_fetch, meta_hash, row, contract_until) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(url) DO UPDATE SET last_fetch = excluded.last_fetch,"
+                " meta_hash = excluded.meta_hash, row = excluded.row, contract_until = excluded.contract_until",
+                (url, time.time(), digest, json.dumps(info, ensure_ascii=False), info.get("contract_until")),
+            )
+            self._db.commit()
+
+    def due(self, stale_days=STALE_DAYS, contract_days=CONTRACT_DAYS,
+            contract_stale_days=CONTRACT_STALE_DAYS, limit=None, now=None):
+        # most overdue first; "overdue" = age / allowed age, never fetched = infinite
+        now = now or time.time()
+        soon = (date.today() + timedelta(days=contract_days)).isoformat()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT url, last_fetch, contract_until, priority FROM players"
+            ).fetchall()
+        picked = []
+        for url, last_fetch, contract, priority in rows:
+            if last_fetch is None:
+                picked.append((float("inf"), priority, url))
+                continue
+            ends_soon = bool(contract) and contract[:1].isdigit() and contract <= soon
+            allowed = (contract_stale_days if ends_soon else stale_days) * 86400
+            overdue = (now - last_fetch) / allowed
+            if overdue >= 1:
+                picked.append((overdue, priority, url))
+        picked.sort(key=lambda p: (p[1], p[0]), reverse=True)
+        urls = [url for _, _, url in picked]
+        return urls[:limit] if limit else urls
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+def refresh_one(url, state, limiter):
+    html = main.fetch_html(url, headless=True, limiter=limiter)
+    digest = meta_hash(html)
+    prev = state.get(url)
+    if digest and prev and prev["meta_hash"] == digest and prev["row"]:
+        state.touch(url)
+        return None
+    info = main.parse_page(html, url)
+    state.update(url, digest, info)
+    return info
+
+def run(state, urls, workers=batch.DEFAULT_WORKERS, per_host=batch.DEFAULT_PER_HOST):
+    main.SAVE_DEBUG_HTML = False
+    limiter = batch.HostLimiter(per_host=per_host)
+    changed, unchanged, failed = 0, 0, []
+    with main.open_sink() as out, ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(refresh_one, url, state, limiter): url for url in urls}
+        for fut in as_completed(futures):
+            url = futures[fut]
+            try:
+                info = fut.result()
+            except Exception as e:
+                print("[scheduler] failed:", url, "-", e)
+                failed.append(url)
+                continue
+            if info is None:
+                unchanged += 1
+                continue
+            out.write(info)
+            changed += 1
+    session.save_cookies()
+    print(f"[scheduler] {changed} changed, {unchanged} unchanged (not re-extracted), {len(failed)} failed")
+    metrics.count("meta_hash", "changed", changed)
+    metrics.count("meta_hash", "unchanged", unchanged)
+    metrics.summary()
+    return changed, unchanged, failed
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Refresh players that are due.")
+    ap.add_argument("--add", metavar="FILE", help="register player URLs from FILE (- for stdin)")
+    ap.add_argument("--priority", type=int, default=0, help="priority for --add (higher goes first)")
+    ap.add_argument("--stale-days", type=float, default=STALE_DAYS)
+    ap.add_argument("--contract-days", type=int, default=CONTRACT_DAYS)
+    ap.add_argument("--contract-stale-days", type=float, default=CONTRACT_STALE_DAYS)
+    ap.add_argument("--limit", type=int, default=None)
+    ap.add_argument("--workers", type=int, default=batch.DEFAULT_WORKERS)
+    ap.add_argument("--dry-run", action="store_true")
+    return ap.parse_args(argv)
+
+def cli(argv=None):
+    args = parse_args(argv)
+    state = ScrapeState()
+    try:
+        if args.add:
+            urls = batch.read_urls(args.add)
+            state.add(urls, priority=args.priority)
+            print(f"[scheduler] registered {len(urls)} URLs")
+        due = state.due(args.stale_days, args.contract_days, args.contract_stale_days, args.limit)
+        print(f"[scheduler] {len(due)} players due")
+        if args.dry_run:
+            for u in due:
+                print(" ", u)
+            return
+        if due:
+            run(state, due, workers=args.workers)
+    finally:
+        state.close()
+
+if __name__ == "__main__":
+    cli()
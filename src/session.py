@@ -0,0 +1,121 @@
+# src/session.py
+# One long-lived cloudscraper session per process.
+#
+# Creating a scraper per attempt means a new TLS handshake, a new challenge
+# solve and an empty cookie jar every time. Instead we keep a single session
+# (requests keeps the connections alive), load the cookies we earned on the
+# last run from disk, and only visit the site root again when the cookies
+# for a host are old.
+#
+# The http2 backend (async_fetch.py) shares the cookies through
+# get_cookie_jar(). If no cloudscraper session exists yet it gets a plain
+# http.cookiejar.CookieJar instead, so that backend runs without cloudscraper
+# installed; a session created later starts from that jar's cookies, and
+# save_cookies() writes out both.
+import os
+import time
+import threading
+
+# ---------------- CONFIG ----------------
+THIS_DIR = os.path.dirname(__file__)
+COOKIE_JAR = os.path.join(THIS_DIR, "..", "data", "cookies.txt")
+BROWSER = {"browser": "chrome", "platform": "windows", "mobile": False}
+WARMUP_TTL = 15 * 60        # seconds before a root visit is considered stale
+# ----------------------------------------
+
+_lock = threading.Lock()
+_scraper = None
+_jar = None                 # cookie jar handed out while there is no session
+_warmed = {}                # host -> time of last root visit
+
+def get_scraper():
+    global _scraper
+    with _lock:
+        if _scraper is None:
+            try:
+                import cloudscraper
+            except ImportError:
+                raise SystemExit("cloudscraper missing. Install with: pip install cloudscraper")
+            _scraper = cloudscraper.create_scraper(browser=BROWSER)
+            if _jar is not None:
+                for c in _jar:
+                    _scraper.cookies.set_cookie(c)
+            else:
+                n = load_cookies(_scraper.cookies)
+                if n:
+                    print(f"[session] Loaded {n} cookies from {COOKIE_JAR}")
+        return _scraper
+
+def get_cookie_jar():
+    # an http.cookiejar.CookieJar: the session's if there is one, else a plain
+    # jar loaded from disk (async_fetch shares it)
+    global _jar
+    with _lock:
+        if _scraper is not None:
+            return _scraper.cookies
+        if _jar is None:
+            from http.cookiejar import CookieJar
+            _jar = CookieJar()
+            n = load_cookies(_jar)
+            if n:
+                print(f"[session] Loaded {n} cookies from {COOKIE_JAR}")
+        return _jar
+
+def load_cookies(target, path=None):
+    # copies the saved cookies into the jar `target`
+    from http.cookiejar import LWPCookieJar
+    path = path or COOKIE_JAR
+    if not os.path.exists(path):
+        return 0
+    jar = LWPCookieJar(path)
+    try:
+        jar.load(ignore_discard=True)
+    except Exception as e:
+        print("[session] could not read cookie jar:", e)
+        return 0
+    n = 0
+    for c in jar:
+        target.set_cookie(c)
+        n += 1
+    return n
+
+def save_cookies(path=None):
+    # nothing to save if no request was made this run
+    jars = [] if _jar is None else [_jar]
+    if _scraper is not None:
+        jars.append(_scraper.cookies)   # last, so its copy of a cookie wins
+    if not jars:
+        return
+    from http.cookiejar import LWPCookieJar
+    path = path or COOKIE_JAR
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    jar = LWPCookieJar(path)
+    for source in jars:
+        for c in source:
+            jar.set_cookie(c)
+    try:
+        jar.save(ignore_discard=True)
+    except Exception as e:
+        print("[session] could not save cookie jar:", e)
+
+def needs_warmup(host):
+    with _lock:
+        last = _warmed.get(host)
+    return last is None or time.time() - last > WARMUP_TTL
+
+def mark_warmed(host):
+    with _lock:
+        _warmed[host] = time.time()
+
+def reset():
+    # drop the session and jar (cookies on disk are kept)
+    global _scraper, _jar
+    with _lock:
+        if _scraper is not None:
+            try:
+                _scraper.close()
+            except Exception:
+                pass
+        _scraper = None
+        _jar = None
+        _warmed.clear()
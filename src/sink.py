@@ -0,0 +1,132 @@
+# src/sink.py
+# Output sink that stays open for a whole run.
+#
+# Rows are keyed by source_url: the existing CSV is loaded into an index on
+# open, a second scrape of the same player replaces its row instead of adding
+# a duplicate (fields it didn't find keep their old values), and new rows are buffered and appended in batches. If rows had
+# to be replaced (or the file is in an old layout: no header, rows from
+# before debut/contract_until existed) the file is rewritten once on close.
+# Optionally a Parquet copy is written next to it (needs pyarrow).
+import os
+import csv
+import threading
+
+import metrics
+
+# ---------------- CONFIG ----------------
+HEADER = ["name", "dob", "age", "height", "weight", "nationality", "position",
+          "preferred_foot", "birthplace", "debut", "contract_until", "source_url"]
+# rows written before debut/contract_until were added
+OLD_HEADER = [h for h in HEADER if h not in ("debut", "contract_until")]
+BATCH_SIZE = 200
+# ----------------------------------------
+
+class CsvSink:
+    def __init__(self, path, parquet_path=None, batch_size=BATCH_SIZE):
+        self.path = path
+        self.parquet_path = parquet_path
+        self.batch_size = batch_size
+        self.rows = {}          # source_url -> row, in file order
+        self.pending = []       # new rows not yet appended
+        self.rewrite = False    # file needs a full rewrite on close
+        self.written = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", newline="", encoding="utf-8") as f:
+            records = list(csv.reader(f))
+        if not records or records[0] != HEADER:
+            self.rewrite = True
+        dropped = 0
+        for rec in records:
+            if rec == HEADER or not rec:
+                continue
+            if len(rec) == len(HEADER):
+                row = dict(zip(HEADER, rec))
+            elif len(rec) == len(OLD_HEADER):
+                row = dict(zip(OLD_HEADER, rec))
+                row["debut"] = row["contract_until"] = "Not Found"
+                self.rewrite = True
+            else:
+                dropped += 1
+                self.rewrite = True
+                continue
+            if row["source_url"] in self.rows:
+                self.rewrite = True
+            # later rows are newer
+            self.rows.pop(row["source_url"], None)
+            self.rows[row["source_url"]] = row
+        if dropped:
+            print(f"[sink] dropped {dropped} malformed rows from {self.path}")
+
+    def write(self, row):
+        row = {k: row.get(k, "Not Found") for k in HEADER}
+        with self._lock:
+            url = row["source_url"]
+            old = self.rows.get(url)
+            if old is not None:
+                # fields this scrape didn't find keep their stored value
+                row = {k: old[k] if v == "Not Found" else v for k, v in row.items()}
+                self.rewrite = True
+            else:
+                self.pending.append(row)
+            self.rows[url] = row
+            self.written += 1
+            if not self.rewrite and len(self.pending) >= self.batch_size:
+                self._append()
+
+    @metrics.timed("csv_append")
+    def _append(self):
+        if not self.pending:
+            return
+        new_file = not os.path.exists(self.path)
+        with open(self.path, "a", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=HEADER)
+            if new_file:
+                w.writeheader()
+            w.writerows(self.pending)
+        self.pending = []
+
+    @metrics.timed("csv_rewrite")
+    def _rewrite(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=HEADER)
+            w.writeheader()
+            w.writerows(self.rows.values())
+        os.replace(tmp, self.path)
+        self.pending = []
+        self.rewrite = False
+
+    def flush(self):
+        with self._lock:
+            if self.rewrite:
+                self._rewrite()
+            else:
+                self._append()
+
+    def write_parquet(self):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            print("[sink] pyarrow not installed; skipping", self.parquet_path)
+            return
+        with self._lock:
+            cols = {k: [r[k] for r in self.rows.values()] for k in HEADER}
+        pq.write_table(pa.table(cols), self.parquet_path)
+
+    def close(self):
+        self.flush()
+        if self.parquet_path:
+            self.write_parquet()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,214 @@
+# src/store.py
+# SQLite player store (data/players.db), the default output behind save_csv.
+#
+# One row per player, keyed by the FBref id from source_url (the URL itself
+# if it has none), so a re-scrape updates the row in place; a field the
+# re-scrape didn't find keeps its stored value (a challenge or error page
+# parses to an empty row, which must not wipe a good one). Missing values
+# are NULL, dates are ISO strings, and nationality, position and
+# contract_until are indexed: "contracts ending within a year" is an index
+# range scan instead of reading the whole CSV. Writes are buffered and
+# committed batch_size rows per transaction; the database runs in WAL mode
+# with a busy timeout, so several writer processes (pipeline, scheduler,
+# crawl) can share it. PlayerStore has the same write/flush/close interface
+# as sink.CsvSink. The CSV layout is still available as an export.
+#
+# usage:
+#   python src/store.py export data/output.csv
+#   python src/store.py import data/output.csv        # load an old CSV
+#   python src/store.py expiring --days 365
+#   python src/store.py count
+import os
+import csv
+import sys
+import time
+import sqlite3
+import argparse
+import threading
+from datetime import date, timedelta
+
+import metrics
+from sink import HEADER, CsvSink
+
+# ---------------- CONFIG ----------------
+THIS_DIR = os.path.dirname(__file__)
+STORE_DB = os.path.join(THIS_DIR, "..", "data", "players.db")
+BATCH_SIZE = 200
+BUSY_TIMEOUT = 30           # seconds to wait for another writer's lock
+MISSING = "Not Found"
+# ----------------------------------------
+
+COLUMNS = ["player_id"] + HEADER + ["updated_at"]
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS players ("
+    " player_id TEXT PRIMARY KEY, name TEXT, dob TEXT, age TEXT, height TEXT, weight TEXT,"
+    " nationality TEXT, position TEXT, preferred_foot TEXT, birthplace TEXT, debut TEXT,"
+    " contract_until TEXT, source_url TEXT, updated_at REAL)",
+    "CREATE INDEX IF NOT EXISTS players_nationality ON players(nationality)",
+    "CREATE INDEX IF NOT EXISTS players_position ON players(position)",
+    "CREATE INDEX IF NOT EXISTS players_contract ON players(contract_until)",
+)
+UPSERT = (
+    f"INSERT INTO players ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+    " ON CONFLICT(player_id) DO UPDATE SET "
+    + ", ".join(f"{c} = COALESCE(excluded.{c}, players.{c})" for c in COLUMNS[1:])
+)
+
+def player_key(url):
+    from main import player_id_from_url
+    return player_id_from_url(url) or url
+
+def _value(v):
+    return None if v is None or v == MISSING or v == "" else str(v)
+
+class PlayerStore:
+    def __init__(self, path=STORE_DB, parquet_path=None, batch_size=BATCH_SIZE):
+        self.path = path
+        self.parquet_path = parquet_path
+        self.batch_size = batch_size
+        self.pending = []
+        self.written = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        for stmt in SCHEMA:
+            self._db.execute(stmt)
+        self._db.commit()
+
+    def write(self, row):
+        rec = [player_key(row.get("source_url"))] + [_value(row.get(k)) for k in HEADER] + [time.time()]
+        with self._lock:
+            self.pending.append(rec)
+            self.written += 1
+            if len(self.pending) >= self.batch_size:
+                self._commit()
+
+    @metrics.timed("store_commit")
+    def _commit(self):
+        if not self.pending:
+            return
+        with self._db:      # one transaction per batch
+            self._db.executemany(UPSERT, self.pending)
+        self.pending = []
+
+    def flush(self):
+        with self._lock:
+            self._commit()
+
+    def import_csv(self, path):
+        # rows from a CsvSink file (any of its layouts), later rows win
+        n = 0
+        for row in CsvSink(path).rows.values():
+            self.write(row)
+            n += 1
+        self.flush()
+        return n
+
+    def query(self, where="1", params=(), order="player_id"):
+        # rows as dicts in the CSV layout ("Not Found" for NULL)
+        with self._lock:
+            self._commit()
+            cur = self._db.execute(
+                f"SELECT {', '.join(HEADER)} FROM players WHERE {where} ORDER BY {order}", params)
+            rows = cur.fetchall()
+        return [{k: MISSING if v is None else v for k, v in zip(HEADER, r)} for r in rows]
+
+    def iter_rows(self, where="1", params=(), order="player_id"):
+        # like query(), but yields the HEADER-ordered tuples (None for NULL)
+        # straight from the cursor instead of building the whole list
+        with self._lock:
+            self._commit()
+            cur = self._db.execute(
+                f"SELECT {', '.join(HEADER)} FROM players WHERE {where} ORDER BY {order}", params)
+        yield from cur
+
+    def get(self, player_id):
+        rows = self.query("player_id = ?", (player_id,))
+        return rows[0] if rows else None
+
+    def expiring(self, days=365, today=None):
+        # contracts ending between today and today + days
+        today = today or date.today()
+        return self.query("contract_until BETWEEN ? AND ?",
+                          (today.isoformat(), (today + timedelta(days=days)).isoformat()),
+                          order="contract_until")
+
+    def by_nationality(self, nationality):
+        return self.query("nationality = ?", (nationality,))
+
+    def by_position(self, position):
+        return self.query("position = ?", (position,))
+
+    def count(self):
+        with self._lock:
+            self._commit()
+            return self._db.execute("SELECT COUNT(*) FROM players").fetchone()[0]
+
+    def export_csv(self, path):
+        rows = self.query(order="rowid")
+        tmp = path + ".tmp"
+        with open(tmp, "w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=HEADER)
+            w.writeheader()
+            w.writerows(rows)
+        os.replace(tmp, path)
+        return len(rows)
+
+    def write_parquet(self):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            print("[store] pyarrow not installed; skipping", self.parquet_path)
+            return
+        rows = self.query(order="rowid")
+        pq.write_table(pa.table({k: [r[k] for r in rows] for k in HEADER}), self.parquet_path)
+
+    def close(self):
+        self.flush()
+        if self.parquet_path:
+            self.write_parquet()
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Query and export the SQLite player store.")
+    ap.add_argument("--db", default=STORE_DB)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("export", help="write the store out in the CSV layout")
+    p.add_argument("csv", nargs="?", default="-")
+    p = sub.add_parser("import", help="load rows from an output CSV")
+    p.add_argument("csv")
+    p = sub.add_parser("expiring", help="contracts ending within --days")
+    p.add_argument("--days", type=int, default=365)
+    sub.add_parser("count")
+    return ap.parse_args(argv)
+
+def cli(argv=None):
+    args = parse_args(argv)
+    with PlayerStore(args.db) as db:
+        if args.cmd == "export":
+            if args.csv == "-":
+                w = csv.DictWriter(sys.stdout, fieldnames=HEADER)
+                w.writeheader()
+                w.writerows(db.query(order="rowid"))
+            else:
+                print(f"exported {db.export_csv(args.csv)} rows to {args.csv}")
+        elif args.cmd == "import":
+            print(f"imported {db.import_csv(args.csv)} rows from {args.csv}")
+        elif args.cmd == "expiring":
+            for r in db.expiring(args.days):
+                print(f"{r['contract_until']}  {r['name']:<30} {r['position']:<15} {r['source_url']}")
+        elif args.cmd == "count":
+            print(db.count())
+
+if __name__ == "__main__":
+    cli()
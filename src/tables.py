@@ -0,0 +1,200 @@
+# src/tables.py
+# Season-by-season stats tables (stats_standard_dom_lg, stats_shooting_dom_lg,
+# scout_summary_*, ...) pulled into columnar records.
+#
+# FBref ships most of these tables inside HTML comments (the browser build
+# un-comments them), so the page is parsed once with lxml and every comment
+# that contains a <table> is parsed once more; live and commented tables are
+# treated the same. Each table becomes one list per column, and columns that
+# are entirely numeric are stored as array('d') (NaN = empty cell).
+#
+# usage:
+#   python src/tables.py src/page.html --url https://fbref.com/en/players/b66315ae/Gabriel-Jesus
+import os
+import re
+import csv
+import math
+import hashlib
+import argparse
+import threading
+from array import array
+from collections import namedtuple
+
+# ---------------- CONFIG ----------------
+THIS_DIR = os.path.dirname(__file__)
+STATS_DIR = os.path.join(THIS_DIR, "..", "data", "stats")
+TABLE_PREFIXES = ("stats_", "scout_summary_")
+SKIP_ROW_CLASSES = ("thead", "over_header", "spacer", "partial_table")
+# ----------------------------------------
+
+NUMBER_RE = re.compile(r'^[+-]?(\d+(\.\d*)?|\.\d+)%?$')
+# ids like stats_player_summary_b66315ae carry the player id; drop it so the
+# same table from every player ends up in one file
+PLAYER_SUFFIX_RE = re.compile(r'_[0-9a-f]{8}$')
+
+# columns: names in order; data: name -> array('d') or list of str/None
+StatsTable = namedtuple("StatsTable", "table_id columns data nrows")
+
+def to_number(s):
+    # "1,304" -> 1304.0, "45.2%" -> 45.2, "" -> nan; None if not a number
+    if not s:
+        return math.nan
+    s = s.replace(",", "")
+    if not NUMBER_RE.match(s):
+        return None
+    return float(s.rstrip("%"))
+
+def table_name(table_id):
+    return PLAYER_SUFFIX_RE.sub("", table_id)
+
+def _iter_tables(doc, prefixes=TABLE_PREFIXES):
+    # live tables, then those in comments; a comment is only parsed if one of
+    # its ids has a wanted prefix, and parses are shared between identical
+    # comments (fragments.py)
+    import fragments
+    for t in doc.iter("table"):
+        yield t
+    index = fragments.lxml_index(doc)
+    for i in index.with_id_prefix(prefixes):
+        try:
+            frag = index.parsed(i)
+        except Exception:
+            continue
+        for t in frag.iter("table"):
+            yield t
+
+def _header(table):
+    # the last header row holds the per-column data-stat names
+    rows = table.xpath("./thead/tr[not(contains(@class, 'over_header'))]")
+    if not rows:
+        return []
+    columns = []
+    for cell in rows[-1]:
+        name = cell.get("data-stat") if cell.tag in ("th", "td") else None
+        if name and name not in columns:
+            columns.append(name)
+    return columns
+
+def _columnar(table_id, columns, raw_rows):
+    data = {}
+    for i, name in enumerate(columns):
+        values = [r[i] if i < len(r) else "" for r in raw_rows]
+        nums = [to_number(v) for v in values]
+        if any(n is None for n in nums):
+            data[name] = [v if v else None for v in values]
+        else:
+            data[name] = array("d", nums)
+    return StatsTable(table_id, columns, data, len(raw_rows))
+
+def parse_table(table):
+    columns = _header(table)
+    if not columns:
+        return None
+    pos = {name: i for i, name in enumerate(columns)}
+    raw_rows = []
+    for tr in table.xpath("./tbody/tr"):
+        cls = tr.get("class") or ""
+        if any(c in cls.split() for c in SKIP_ROW_CLASSES):
+            continue
+        row = [""] * len(columns)
+        for cell in tr:
+            i = pos.get(cell.get("data-stat"))
+            if i is not None:
+                # a numeric csk is the raw sort value ("1304" for "1,304", "9" for "9th")
+                csk = cell.get("csk")
+                if csk and to_number(csk) is not None:
+                    row[i] = csk
+                else:
+                    row[i] = cell.text_content().strip()
+        raw_rows.append(row)
+    return _columnar(table.get("id"), columns, raw_rows)
+
+def extract_tables(html, prefixes=TABLE_PREFIXES):
+    # html: str, UTF-8 bytes or an mmap of them
+    import lxml.html
+    if isinstance(html, str):
+        doc = lxml.html.fromstring(html)
+    else:
+        parser = lxml.html.HTMLParser(encoding="utf-8")
+        doc = lxml.html.document_fromstring(html if isinstance(html, bytes) else html[:], parser=parser)
+    out = {}
+    for t in _iter_tables(doc, prefixes):
+        tid = t.get("id") or ""
+        if not tid.startswith(prefixes) or tid in out:
+            continue
+        parsed = parse_table(t)
+        if parsed is not None and parsed.nrows:
+            out[tid] = parsed
+    return out
+
+def _cell(v):
+    if v is None:
+        return ""
+    if isinstance(v, float):
+        if math.isnan(v):
+            return ""
+        return str(int(v)) if v.is_integer() else repr(v)
+    return v
+
+class TableWriter:
+    # appends every table to STATS_DIR/<table name>.csv, one row per season row,
+    # prefixed with the player id and source URL. A table whose columns differ
+    # from that file's (FBref adds columns for some competitions and seasons)
+    # goes to <table name>.<hash of its header>.csv instead
+    def __init__(self, out_dir=STATS_DIR):
+        self.out_dir = out_dir
+        self._lock = threading.Lock()
+        self._headers = {}
+        os.makedirs(out_dir, exist_ok=True)
+
+    def _file_header(self, path):
+        if path not in self._headers:
+            header = None
+            if os.path.exists(path):
+                with open(path, "r", newline="", encoding="utf-8") as f:
+                    header = next(csv.reader(f), None)
+            self._headers[path] = header
+        return self._headers[path]
+
+    def write(self, player_id, url, tables):
+        with self._lock:
+            for tid, t in tables.items():
+                name = table_name(tid)
+                path = os.path.join(self.out_dir, name + ".csv")
+                header = ["player_id", "source_url"] + list(t.columns)
+                existing = self._file_header(path)
+                if existing is not None and existing != header:
+                    digest = hashlib.blake2b("\x1f".join(header).encode("utf-8"), digest_size=4).hexdigest()
+                    path = os.path.join(self.out_dir, f"{name}.{digest}.csv")
+                    existing = self._file_header(path)
+                    if existing is None:
+                        print(f"[tables] {tid}: columns differ from {name}.csv; writing {path}")
+                with open(path, "a", newline="", encoding="utf-8") as f:
+                    w = csv.writer(f)
+                    if existing is None:
+                        w.writerow(header)
+                        self._headers[path] = header
+                    cols = [t.data[c] for c in t.columns]
+                    for i in range(t.nrows):
+                        w.writerow([player_id, url] + [_cell(col[i]) for col in cols])
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Extract FBref stats tables from saved pages.")
+    ap.add_argument("pages", nargs="+")
+    ap.add_argument("--url", default="", help="source URL to record (single page)")
+    ap.add_argument("--out", default=STATS_DIR)
+    return ap.parse_args(argv)
+
+def cli(argv=None):
+    from main import player_id_from_url
+    args = parse_args(argv)
+    writer = TableWriter(args.out)
+    for p in args.pages:
+        with open(p, "rb") as f:
+            tables = extract_tables(f.read())
+        writer.write(player_id_from_url(args.url), args.url, tables)
+        for tid, t in tables.items():
+            print(f"{p}: {tid}: {t.nrows} rows x {len(t.columns)} columns")
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,155 @@
+# src/xpath_extract.py
+# lxml + XPath extraction backend (main.EXTRACT_BACKEND = "lxml").
+#
+# The BeautifulSoup path builds a Python object per node and walks them with
+# find / find_next / string filters. Here the page is parsed straight into an
+# lxml tree and #meta, the JSON-LD scripts, <strong> labels and itemprop spans
+# are found with precompiled XPath expressions, so the tree walking happens
+# in libxml2. LxmlScan answers the same questions as main.PageScan, and the
+# field rules themselves (main.extract_fields) are shared, so both backends
+# produce the same rows; `python src/bench.py --corpus DIR --extractor lxml`
+# checks that against golden.json.
+#
+# Text is collected the way bs4's get_text() does it: strings inside
+# <script>, <style>, <template>, <rt> and <rp> and comments are skipped.
+import lxml.html
+from lxml import etree
+
+import main
+import metrics
+import fragments
+
+# text nodes bs4 treats as plain strings
+_TEXT = "text()[not(ancestor::script or ancestor::style or ancestor::template or ancestor::rt or ancestor::rp)]"
+STRINGS = etree.XPath(".//" + _TEXT, smart_strings=False)
+META = etree.XPath("(//*[@id='meta'])[1]")
+H1 = etree.XPath("(//h1)[1]")
+JSON_LD_HEAD = etree.XPath("(//head)[1]//script[@type='application/ld+json']")
+JSON_LD = etree.XPath("//script[@type='application/ld+json']")
+ANCHORS = etree.XPath(".//a")
+STRONGS = etree.XPath(".//strong")
+ALL_STRONGS = etree.XPath("//strong")
+ITEMPROP_SPANS = etree.XPath(".//span[@itemprop]")
+ITEMPROP_SPAN = etree.XPath("(//span[@itemprop=$name])[1]")
+NEXT_SPAN = etree.XPath("(descendant::span | following::span)[1]")
+
+def get_text(el, sep=""):
+    # Tag.get_text(sep, strip=True)
+    return sep.join(t for t in (s.strip() for s in STRINGS(el)) if t)
+
+def tag_string(el):
+    # Tag.string: the only child's string, recursively; else None
+    while True:
+        if el.text:
+            return None if len(el) else el.text
+        if len(el) != 1 or el[0].tail:
+            return None
+        el = el[0]
+        if not isinstance(el.tag, str):     # a comment
+            return el.text
+
+def _first(found):
+    return found[0] if found else None
+
+class LxmlScan(main.PageScan):
+    # same state as PageScan; its __init__ calls our _walk
+    def __init__(self, doc, fragment=None):
+        self.doc = doc
+        super().__init__(None, fragment)
+
+    def _walk(self, fragment):
+        self.strings = [t for t in (s.strip() for s in STRINGS(fragment)) if t]
+        self.anchors = [(get_text(a), a.get("href", "")) for a in ANCHORS(fragment)]
+        for node in STRONGS(fragment):
+            label = tag_string(node)
+            if label:
+                label = label.lower()
+                for kw in main.STRONG_LABELS:
+                    if kw in label and kw not in self.strong:
+                        self.strong[kw] = node
+        for node in ITEMPROP_SPANS(fragment):
+            prop = node.get("itemprop")
+            if prop in main.ITEMPROPS and prop not in self.itemprop:
+                self.itemprop[prop] = node
+
+    def find_strong(self, keyword):
+        tag = self.strong.get(keyword)
+        if tag is None:
+            for node in ALL_STRONGS(self.doc):
+                s = tag_string(node)
+                if s and keyword in s.lower():
+                    return node
+        return tag
+
+    def find_itemprop(self, name):
+        tag = self.itemprop.get(name)
+        if tag is None:
+            tag = _first(ITEMPROP_SPAN(self.doc, name=name))
+        return tag
+
+    @property
+    def whole_text(self):
+        if self._whole_text is None:
+            with metrics.timer("extract.page_text"):
+                self._whole_text = get_text(self.doc, " ")
+        return self._whole_text
+
+    def heading(self):
+        h1 = _first(H1(self.doc))
+        return get_text(h1) if h1 is not None else None
+
+    @metrics.timed("extract.json_ld")
+    def json_ld(self):
+        scripts = JSON_LD_HEAD(self.doc) or JSON_LD(self.doc)
+        return main.pick_json_ld(s.text for s in scripts)
+
+    def strong_parent_text(self, keyword):
+        tag = self.find_strong(keyword)
+        return get_text(tag.getparent(), " ") if tag is not None else None
+
+    def born_spans(self):
+        born_tag = self.find_strong("born")
+        if born_tag is None:
+            return None
+        date_span = _first(NEXT_SPAN(born_tag))
+        if date_span is None:
+            return None, None
+        bp_span = _first(NEXT_SPAN(date_span))
+        return get_text(date_span), get_text(bp_span) if bp_span is not None else None
+
+    def itemprop_text(self, name):
+        tag = self.find_itemprop(name)
+        return get_text(tag) if tag is not None else None
+
+def make_doc(html):
+    # html: str, UTF-8 bytes or an mmap of them
+    if isinstance(html, str):
+        return lxml.html.document_fromstring(html)
+    parser = lxml.html.HTMLParser(encoding="utf-8")
+    return lxml.html.document_fromstring(html if isinstance(html, bytes) else html[:], parser=parser)
+
+@metrics.timed("find_meta_fragment")
+def find_meta_fragment(doc):
+    # main.find_meta_fragment for an lxml document
+    meta = _first(META(doc))
+    if meta is not None:
+        return meta, "meta_id"
+    index = fragments.lxml_index(doc, main.META_COMMENT_NEEDLES)
+    if len(index):
+        return index.parsed(0), "meta_in_comment"
+    return None, None
+
+@metrics.timed("extract_player")
+def extract_player(doc, meta_fragment, sources=None):
+    with metrics.timer("extract.meta_scan"):
+        scan = LxmlScan(doc, meta_fragment)
+    return main.extract_fields(scan, sources)
+
+def extract_document(html, sources=None, stage="full", need_meta=False):
+    # main.extract_document for EXTRACT_BACKEND = "lxml"
+    with metrics.timer("lxml_parse." + stage):
+        doc = make_doc(html)
+    meta_frag, method = find_meta_fragment(doc)
+    if meta_frag is None and need_meta:
+        return None, None
+    return extract_player(doc, meta_frag, sources), method